@@ -0,0 +1,36 @@
+"""Add owner scoped indexes to todos
+
+Revision ID: 7c3e1f9a2b54
+Revises: 0d2fcc6a9c78
+Create Date: 2026-10-18 09:12:31.402215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '7c3e1f9a2b54'
+down_revision: Union[str, Sequence[str], None] = '0d2fcc6a9c78'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps the todos table writable while Postgres builds the
+    # indexes; it can't run inside a transaction, hence the autocommit block.
+    # if_not_exists covers databases whose tables came from create_all.
+    with op.get_context().autocommit_block():
+        op.create_index("ix_todos_owner_id_id", "todos", ["owner_id", "id"],
+                        if_not_exists=True, postgresql_concurrently=True)
+        op.create_index("ix_todos_owner_id_complete", "todos", ["owner_id", "complete"],
+                        if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_todos_owner_id_complete", table_name="todos",
+                      if_exists=True, postgresql_concurrently=True)
+        op.drop_index("ix_todos_owner_id_id", table_name="todos",
+                      if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,66 @@
+"""Add full text search to todos
+
+Revision ID: b81d4e0c6f3a
+Revises: 7c3e1f9a2b54
+Create Date: 2026-10-18 10:02:47.118530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'b81d4e0c6f3a'
+down_revision: Union[str, Sequence[str], None] = '7c3e1f9a2b54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        # Generated column: Postgres keeps it current on every insert and update
+        op.execute("""
+            ALTER TABLE todos ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(description, '')), 'B')
+            ) STORED
+        """)
+        with op.get_context().autocommit_block():
+            op.create_index("ix_todos_search_vector", "todos", ["search_vector"], postgresql_using="gin",
+                            if_not_exists=True, postgresql_concurrently=True)
+    else:
+        op.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS todos_fts
+            USING fts5(title, description, content='todos', content_rowid='id')
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS todos_fts_insert AFTER INSERT ON todos BEGIN
+                INSERT INTO todos_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS todos_fts_delete AFTER DELETE ON todos BEGIN
+                INSERT INTO todos_fts(todos_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS todos_fts_update AFTER UPDATE OF title, description ON todos BEGIN
+                INSERT INTO todos_fts(todos_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+                INSERT INTO todos_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+            END
+        """)
+        op.execute("INSERT INTO todos_fts(todos_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.drop_index("ix_todos_search_vector", table_name="todos",
+                          if_exists=True, postgresql_concurrently=True)
+        op.execute("ALTER TABLE todos DROP COLUMN IF EXISTS search_vector")
+    else:
+        for trigger in ("todos_fts_insert", "todos_fts_delete", "todos_fts_update"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS todos_fts")
@@ -0,0 +1,43 @@
+"""Add filter and sort indexes to todos
+
+Revision ID: c4a9e2d7f1b8
+Revises: b81d4e0c6f3a
+Create Date: 2026-10-18 10:31:05.642871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c4a9e2d7f1b8'
+down_revision: Union[str, Sequence[str], None] = 'b81d4e0c6f3a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # (owner_id, complete, id) replaces (owner_id, complete): it serves the same
+    # lookups and also the complete-filtered list ordered by id
+    with op.get_context().autocommit_block():
+        op.create_index("ix_todos_owner_id_complete_id", "todos", ["owner_id", "complete", "id"],
+                        if_not_exists=True, postgresql_concurrently=True)
+        op.create_index("ix_todos_owner_id_priority_id", "todos", ["owner_id", "priority", "id"],
+                        if_not_exists=True, postgresql_concurrently=True)
+        op.create_index("ix_todos_owner_id_complete_priority_id", "todos", ["owner_id", "complete", "priority", "id"],
+                        if_not_exists=True, postgresql_concurrently=True)
+        op.drop_index("ix_todos_owner_id_complete", table_name="todos",
+                      if_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index("ix_todos_owner_id_complete", "todos", ["owner_id", "complete"],
+                        if_not_exists=True, postgresql_concurrently=True)
+        op.drop_index("ix_todos_owner_id_complete_priority_id", table_name="todos",
+                      if_exists=True, postgresql_concurrently=True)
+        op.drop_index("ix_todos_owner_id_priority_id", table_name="todos",
+                      if_exists=True, postgresql_concurrently=True)
+        op.drop_index("ix_todos_owner_id_complete_id", table_name="todos",
+                      if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,48 @@
+"""Add todo version, todo counter and rate limit tables
+
+Revision ID: d7e2a5c9b3f1
+Revises: c4a9e2d7f1b8
+Create Date: 2026-10-18 14:12:47.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'd7e2a5c9b3f1'
+down_revision: Union[str, Sequence[str], None] = 'c4a9e2d7f1b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # if_not_exists: databases started with DB_CREATE_SCHEMA on already have these from create_all
+    op.create_table(
+        "todo_versions",
+        sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "todo_counters",
+        sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("total", sa.Integer(), nullable=False),
+        sa.Column("completed", sa.Integer(), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "rate_limit_buckets",
+        sa.Column("key", sa.String(), primary_key=True),
+        sa.Column("tokens", sa.Float(), nullable=False),
+        sa.Column("updated_at", sa.Float(), nullable=False),
+        sa.Column("allowed", sa.Boolean(), nullable=False),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("rate_limit_buckets", if_exists=True)
+    op.drop_table("todo_counters", if_exists=True)
+    op.drop_table("todo_versions", if_exists=True)
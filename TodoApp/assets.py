@@ -0,0 +1,146 @@
+"""Fingerprinted, precompressed static assets.
+
+Build step (run on deploy, writes TodoApp/static/dist):
+
+    python -m TodoApp.assets
+
+Each file under TodoApp/static is copied to dist/ with a content hash in its
+name, alongside .gz and .br variants, and dist/manifest.json maps the
+original path to the hashed one. Templates link assets through asset_url(),
+which falls back to the plain file when no build exists.
+"""
+import functools
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import stat
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:  # brotli variants are skipped without it
+    brotli = None
+
+STATIC_DIRECTORY = "TodoApp/static"
+DIST_DIRECTORY = "dist"
+MANIFEST_NAME = "manifest.json"
+# Worth compressing; images and fonts are already compressed
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".map", ".svg", ".json", ".html", ".txt"}
+# Source maps keep their names so sourceMappingURL comments still resolve
+UNHASHED_EXTENSIONS = {".map"}
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def fingerprinted_name(relative_path: str, content: bytes) -> str:
+    root, extension = os.path.splitext(relative_path)
+    if extension in UNHASHED_EXTENSIONS:
+        return relative_path
+    return f"{root}.{hashlib.sha256(content).hexdigest()[:12]}{extension}"
+
+
+def build_assets(static_directory: str = STATIC_DIRECTORY) -> dict:
+    """(Re)build dist/ under `static_directory` and return the manifest."""
+    dist_directory = os.path.join(static_directory, DIST_DIRECTORY)
+    shutil.rmtree(dist_directory, ignore_errors=True)
+    manifest = {}
+
+    for directory, subdirectories, files in os.walk(static_directory):
+        if directory == static_directory:
+            subdirectories[:] = [name for name in subdirectories if name != DIST_DIRECTORY]
+        for filename in files:
+            source = os.path.join(directory, filename)
+            relative_path = os.path.relpath(source, static_directory).replace(os.sep, "/")
+            with open(source, "rb") as source_file:
+                content = source_file.read()
+
+            hashed_path = fingerprinted_name(relative_path, content)
+            target = os.path.join(dist_directory, *hashed_path.split("/"))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as target_file:
+                target_file.write(content)
+            manifest[relative_path] = hashed_path
+
+            if os.path.splitext(filename)[1] not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            variants = {".gz": gzip.compress(content, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants[".br"] = brotli.compress(content, quality=11)
+            for suffix, compressed in variants.items():
+                # Only keep variants that actually save bytes
+                if len(compressed) < len(content):
+                    with open(target + suffix, "wb") as variant_file:
+                        variant_file.write(compressed)
+
+    with open(os.path.join(dist_directory, MANIFEST_NAME), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    return manifest
+
+
+@functools.cache
+def load_manifest(static_directory: str = STATIC_DIRECTORY) -> dict:
+    try:
+        with open(os.path.join(static_directory, DIST_DIRECTORY, MANIFEST_NAME)) as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        return {}
+
+
+def asset_url(path: str) -> str:
+    """URL for a static asset, fingerprinted when a build exists."""
+    path = path.lstrip("/")
+    hashed_path = load_manifest().get(path)
+    if hashed_path is None:
+        return f"/static/{path}"
+    return f"/static/{DIST_DIRECTORY}/{hashed_path}"
+
+
+def accepted_encodings(scope: Scope) -> set[str]:
+    encodings = set()
+    for token in Headers(scope=scope).get("accept-encoding", "").split(","):
+        name, _, params = token.strip().partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+class AssetStaticFiles(StaticFiles):
+    """StaticFiles that serves the built dist/ files precompressed and cached forever.
+
+    Files outside dist/ are served as before.
+    """
+
+    async def get_response(self, path: str, scope: Scope):
+        if not path.startswith(DIST_DIRECTORY + os.sep):
+            return await super().get_response(path, scope)
+
+        encodings = accepted_encodings(scope)
+        response = None
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if encoding not in encodings:
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+            if stat_result is not None and stat.S_ISREG(stat_result.st_mode):
+                response = self.file_response(full_path, stat_result, scope)
+                response.headers["content-encoding"] = encoding
+                media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+                if media_type.startswith("text/") or media_type == "application/javascript":
+                    media_type += "; charset=utf-8"
+                response.headers["content-type"] = media_type
+                break
+        if response is None:
+            response = await super().get_response(path, scope)
+        response.headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+        response.headers["vary"] = "Accept-Encoding"
+        return response
+
+
+if __name__ == "__main__":
+    built = build_assets()
+    print(f"Built {len(built)} assets into {os.path.join(STATIC_DIRECTORY, DIST_DIRECTORY)}")
@@ -0,0 +1,4 @@
+def percentile(samples: list[float], fraction: float) -> float:
+    """The sample at `fraction` of the way through the sorted samples, e.g. 0.95 for p95."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
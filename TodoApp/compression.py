@@ -0,0 +1,97 @@
+import os
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Responses smaller than this are sent as-is
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", 1024))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", 6))
+COMPRESSION_CONTENT_TYPES = [
+    content_type.strip() for content_type in os.getenv(
+        "COMPRESSION_CONTENT_TYPES",
+        "application/json,application/x-ndjson,text/html,text/plain,text/css,application/javascript"
+    ).split(",") if content_type.strip()
+]
+
+
+class CompressionMiddleware:
+    """Gzip responses whose content type is on an allowlist.
+
+    Whole responses are compressed only past `minimum_size`. Streaming
+    responses are compressed chunk by chunk with a sync flush after each one,
+    so clients keep receiving data as it is produced.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+                 compresslevel: int = COMPRESSION_LEVEL, content_types: list[str] = COMPRESSION_CONTENT_TYPES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.content_types = tuple(content_types)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "HEAD" or "gzip" not in Headers(scope=scope).get("accept-encoding", ""):
+            await self.app(scope, receive, send)
+            return
+        await GzipResponder(self, send)(scope, receive, self.app)
+
+
+class GzipResponder:
+    def __init__(self, middleware: CompressionMiddleware, send: Send):
+        self.middleware = middleware
+        self.send = send
+        self.start_message: Message | None = None
+        self.compress = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, app: ASGIApp):
+        await app(scope, receive, self.send_with_compression)
+
+    def should_compress(self, message: Message) -> bool:
+        headers = Headers(raw=message["headers"])
+        media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return (
+            message["status"] not in (204, 304)
+            and "content-encoding" not in headers
+            and media_type.startswith(self.middleware.content_types)
+        )
+
+    async def send_with_compression(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            self.passthrough = not self.should_compress(message)
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            # First body message: decide how to send the response
+            start_message, self.start_message = self.start_message, None
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+            if not self.passthrough:
+                self.compress = zlib.compressobj(self.middleware.compresslevel, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+                headers = MutableHeaders(raw=start_message["headers"])
+                headers["Content-Encoding"] = "gzip"
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body:
+                    compressed = self.compress.compress(body) + self.compress.flush()
+                    headers["Content-Length"] = str(len(compressed))
+                    await self.send(start_message)
+                    await self.send({"type": "http.response.body", "body": compressed})
+                    return
+                del headers["Content-Length"]
+            await self.send(start_message)
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        # Streaming: flush each chunk so nothing sits in the compressor's buffer
+        chunk = self.compress.compress(body) # type: ignore
+        chunk += self.compress.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH) # type: ignore
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
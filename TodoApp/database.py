@@ -1,18 +1,248 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+import asyncio
+import functools
 import os
+import time
 from dotenv import load_dotenv
+from TodoApp.metrics import Gauge, pool_wait_time, register
 
 load_dotenv()
 
-SQLALCHEMY_DATABASE_URL = os.getenv("SQLALCHEMY_DATABASE_URL_POSTGRES")
+def database_url() -> str:
+	"""The configured database URL; only needed once an engine is first used."""
+	url = os.getenv("SQLALCHEMY_DATABASE_URL_POSTGRES")
+	if url is None:
+		raise ValueError("SQLALCHEMY_DATABASE_URL environment variable is not set.")
+	return url
 
-if SQLALCHEMY_DATABASE_URL is None:
-	raise ValueError("SQLALCHEMY_DATABASE_URL environment variable is not set.")
+def replica_url() -> str | None:
+	"""Optional read replica for read-only handlers; unset means reads use the primary."""
+	return os.getenv("SQLALCHEMY_DATABASE_URL_REPLICA") or None
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Pool and timeout settings, tunable per deployment
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Per-statement timeout in milliseconds, 0 to disable (Postgres only)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 0))
+# Connections each worker opens before it starts serving, 0 to skip
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", DB_POOL_SIZE))
+# Create missing tables when the app starts; turn off once Alembic owns the schema
+DB_CREATE_SCHEMA = os.getenv("DB_CREATE_SCHEMA", "true").lower() == "true"
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Async drivers used by the request handlers, keyed by backend
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
 
-Base = declarative_base()
\ No newline at end of file
+def to_async_url(url: str) -> str:
+	"""Swap the sync driver in a database URL for its asyncio counterpart."""
+	parsed = make_url(url)
+	backend = parsed.get_backend_name()
+	if backend not in ASYNC_DRIVERS:
+		raise ValueError(f"No async driver configured for '{backend}' databases.")
+	return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+class PoolStats:
+	"""Running totals of how long requests waited to check out a connection."""
+
+	def __init__(self):
+		self.waits = 0
+		self.total_wait = 0.0
+		self.max_wait = 0.0
+		self.timeouts = 0
+
+	def record_wait(self, seconds: float, timed_out: bool = False):
+		self.waits += 1
+		self.total_wait += seconds
+		pool_wait_time.observe(seconds)
+		self.max_wait = max(self.max_wait, seconds)
+		if timed_out:
+			self.timeouts += 1
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+	"""AsyncAdaptedQueuePool that records checkout wait time in `self.stats`."""
+
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.stats = PoolStats()
+
+	def _do_get(self):
+		started = time.perf_counter()
+		try:
+			connection = super()._do_get()
+		except Exception:
+			self.stats.record_wait(time.perf_counter() - started, timed_out=True)
+			raise
+		self.stats.record_wait(time.perf_counter() - started)
+		return connection
+
+	def recreate(self):
+		# Keep the running totals across pool resets (e.g. after an invalidation)
+		pool = super().recreate()
+		pool.stats = self.stats # type: ignore
+		return pool
+
+
+def statement_timeout_args(async_url: str) -> dict:
+	"""connect_args that apply DB_STATEMENT_TIMEOUT_MS on each new connection."""
+	if DB_STATEMENT_TIMEOUT_MS <= 0 or make_url(async_url).get_backend_name() != "postgresql":
+		return {}
+	return {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+
+def build_async_engine(url: str):
+	"""Create an async engine for `url` with the pool settings from the environment."""
+	async_url = to_async_url(url)
+	return create_async_engine(
+		async_url,
+		poolclass=TimedQueuePool,
+		pool_size=DB_POOL_SIZE,
+		max_overflow=DB_MAX_OVERFLOW,
+		pool_timeout=DB_POOL_TIMEOUT,
+		pool_recycle=DB_POOL_RECYCLE,
+		pool_pre_ping=DB_POOL_PRE_PING,
+		connect_args=statement_timeout_args(async_url),
+	)
+
+def pool_status(async_engine) -> dict:
+	"""Live occupancy and wait-time figures for an engine built by build_async_engine."""
+	pool = async_engine.sync_engine.pool
+	stats: PoolStats = pool.stats
+	return {
+		"size": pool.size(),
+		"checked_in": pool.checkedin(),
+		"checked_out": pool.checkedout(),
+		"overflow": max(0, pool.overflow()),
+		"max_overflow": DB_MAX_OVERFLOW,
+		"checkouts": stats.waits,
+		"timeouts": stats.timeouts,
+		"avg_wait_ms": round(stats.total_wait / stats.waits * 1000, 3) if stats.waits else 0,
+		"max_wait_ms": round(stats.max_wait * 1000, 3),
+	}
+
+# Engines and session factories are built on first use, normally from the app's
+# lifespan, so importing the app never connects to the database.
+
+@functools.cache
+def get_engine():
+	"""Sync engine for create_all, Alembic and scripts."""
+	return create_engine(database_url(), pool_pre_ping=DB_POOL_PRE_PING)
+
+@functools.cache
+def get_session_local():
+	return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+
+@functools.cache
+def get_async_engine():
+	"""Async engine for the routers so DB round-trips don't block the event loop."""
+	return build_async_engine(database_url())
+
+@functools.cache
+def get_async_session_local():
+	# expire_on_commit=False so handlers can return models after commit without a lazy refresh
+	return async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+
+@functools.cache
+def get_replica_async_engine():
+	"""Async engine for read-only handlers, with its own pool; the primary's if no replica is set."""
+	url = replica_url()
+	return build_async_engine(url) if url else get_async_engine()
+
+@functools.cache
+def get_replica_session_local():
+	return async_sessionmaker(get_replica_async_engine(), autoflush=False, expire_on_commit=False)
+
+def _replica_created() -> bool:
+	return replica_url() is not None and get_replica_async_engine.cache_info().currsize > 0
+
+# `from TodoApp.database import engine` keeps working for scripts and tests
+_LAZY_ATTRIBUTES = {
+	"engine": get_engine,
+	"SessionLocal": get_session_local,
+	"async_engine": get_async_engine,
+	"AsyncSessionLocal": get_async_session_local,
+}
+
+def __getattr__(name: str):
+	if name in _LAZY_ATTRIBUTES:
+		return _LAZY_ATTRIBUTES[name]()
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _read_pool(read):
+	"""Gauge callback that reports 0 until the async engine exists."""
+	return lambda: read(get_async_engine().sync_engine.pool) if get_async_engine.cache_info().currsize else 0
+
+register(Gauge("db_pool_checked_out", "Connections currently checked out of the pool.",
+               _read_pool(lambda pool: pool.checkedout())))
+register(Gauge("db_pool_overflow", "Connections open beyond the pool size.",
+               _read_pool(lambda pool: max(0, pool.overflow()))))
+
+# Run after create_all with a sync connection, for DDL that create_all can't
+# express (e.g. the full-text index in TodoApp.search)
+SCHEMA_HOOKS: list = []
+
+def create_schema():
+	"""Create any missing tables, and run the schema hooks, over a short-lived sync connection.
+
+	For the process that starts the workers, so the schema is created once
+	rather than by every worker at the same time.
+	"""
+	with get_engine().begin() as connection:
+		Base.metadata.create_all(connection)
+		for hook in SCHEMA_HOOKS:
+			hook(connection)
+	get_engine().dispose()
+
+async def init_database():
+	"""Create the async engine and, if DB_CREATE_SCHEMA is on, any missing tables."""
+	async_engine = get_async_engine()
+	if DB_CREATE_SCHEMA:
+		async with async_engine.begin() as connection:
+			await connection.run_sync(Base.metadata.create_all)
+			for hook in SCHEMA_HOOKS:
+				await connection.run_sync(hook)
+
+async def warm_pool(connections: int = DB_POOL_WARMUP):
+	"""Open pooled connections up front so the first requests don't pay for connecting."""
+	engines = [get_async_engine()]
+	if replica_url() is not None:
+		engines.append(get_replica_async_engine())
+
+	async def ping(async_engine):
+		async with async_engine.connect() as connection:
+			await connection.execute(text("SELECT 1"))
+
+	# Held concurrently, so each ping gets its own connection
+	await asyncio.gather(*(ping(async_engine) for async_engine in engines for _ in range(min(connections, DB_POOL_SIZE))))
+
+def reset_after_fork():
+	"""Forget pooled connections inherited from the parent process without closing them under it."""
+	if get_engine.cache_info().currsize:
+		get_engine().dispose(close=False)
+	if get_async_engine.cache_info().currsize:
+		get_async_engine().sync_engine.dispose(close=False)
+	if _replica_created():
+		get_replica_async_engine().sync_engine.dispose(close=False)
+
+async def dispose_engines():
+	"""Close pooled connections of whichever engines were created."""
+	if get_async_engine.cache_info().currsize:
+		await get_async_engine().dispose()
+	if _replica_created():
+		await get_replica_async_engine().dispose()
+	if get_engine.cache_info().currsize:
+		get_engine().dispose()
+
+async def get_db():
+	"""Request-scoped session shared by every router."""
+	async with get_async_session_local()() as db:
+		yield db
+
+Base = declarative_base()
@@ -0,0 +1,46 @@
+import hashlib
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from TodoApp.models import TodoVersions
+
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+async def bump_todo_version(db: AsyncSession, owner_id: int) -> int:
+    """Increment the user's data version inside the caller's transaction; returns the new version."""
+    insert = UPSERT_INSERTS[db.bind.dialect.name] # type: ignore
+    stmt = insert(TodoVersions).values(owner_id=owner_id, version=1)
+    return (await db.execute(stmt.on_conflict_do_update(
+        index_elements=[TodoVersions.owner_id],
+        set_={"version": TodoVersions.version + 1}
+    ).returning(TodoVersions.version))).scalar_one()
+
+async def read_todo_version(db: AsyncSession, owner_id: int) -> int:
+    return await db.scalar(select(TodoVersions.version).where(TodoVersions.owner_id == owner_id)) or 0
+
+def make_etag(owner_id: int, version: int, request: Request) -> str:
+    """Weak ETag for one user's view of a URL (path and query) at a data version."""
+    resource = f"{owner_id}:{request.url.path}?{request.url.query}"
+    digest = hashlib.blake2b(resource.encode(), digest_size=8).hexdigest()
+    return f'W/"{version}-{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # Weak comparison: ignore the W/ prefix on either side
+    return "*" in candidates or etag.removeprefix("W/") in {c.removeprefix("W/") for c in candidates}
+
+async def check_not_modified(request: Request, response: Response, db: AsyncSession, owner_id: int) -> Response | None:
+    """Set the ETag on `response` and return a 304 if the client already has this version.
+
+    Costs one primary-key lookup, so callers can skip their query entirely on a match.
+    """
+    etag = make_etag(owner_id, await read_todo_version(db, owner_id), request)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,187 @@
+"""Per-user todo change events, pushed to open todo pages over Server-Sent Events.
+
+Every todo write publishes one event after it commits. The event id is the
+user's data version (see etags.bump_todo_version), which is the same in every
+worker, so a page that reconnects says which version it last saw and gets the
+missing events replayed from a short per-user history.
+
+The hub is in-process. A page only hears about writes handled by its own
+worker; a write made elsewhere shows up as a version gap at the page's next
+event or reconnect. The page is then sent a `stale` event and live updates
+carry on; the page decides whether (and how often) to re-render.
+"""
+import asyncio
+import json
+import os
+import time
+from bisect import insort
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from TodoApp.templating import env
+
+# Events kept per user for replay after a reconnect
+TODO_EVENTS_HISTORY = int(os.getenv("TODO_EVENTS_HISTORY", 50))
+# Users whose history is kept before the least recently written are dropped
+TODO_EVENTS_MAX_USERS = int(os.getenv("TODO_EVENTS_MAX_USERS", 10000))
+# Events queued for one slow connection before it is sent a stale event
+TODO_EVENTS_MAX_PENDING = int(os.getenv("TODO_EVENTS_MAX_PENDING", 100))
+# A comment line this often keeps idle connections open through proxies
+TODO_EVENTS_KEEPALIVE_SECONDS = float(os.getenv("TODO_EVENTS_KEEPALIVE_SECONDS", 15))
+# Streams end after this long and the browser reconnects (missed events are
+# replayed). Keep it below GRACEFUL_TIMEOUT in TodoApp.serve: a stopping worker
+# waits for open responses before its lifespan shutdown runs, so this is what
+# lets it exit on a reload instead of being killed at the timeout
+TODO_EVENTS_MAX_SECONDS = float(os.getenv("TODO_EVENTS_MAX_SECONDS", 25))
+
+KEEPALIVE_MESSAGE = ": keepalive\n\n"
+
+
+def stale_message(version: int) -> str:
+    """Tells the page it missed changes up to `version`; the id moves its reconnect point past them."""
+    return f"id: {version}\nevent: stale\ndata: {json.dumps({'version': version})}\n\n"
+
+
+@dataclass(frozen=True)
+class TodoEvent:
+    version: int
+    # Encoded once and shared by every subscriber
+    message: str
+
+
+def upserted(todo) -> dict:
+    """Change for a created or updated todo, with its row cells rendered for the page."""
+    return {"op": "upsert", "id": todo["id"], "complete": todo["complete"],
+            "html": env.get_template("todo-row.html").render(todo=todo)}
+
+def deleted(todo_id: int) -> dict:
+    return {"op": "delete", "id": todo_id}
+
+
+class Subscription:
+    def __init__(self, max_pending: int):
+        self._queue: asyncio.Queue[TodoEvent] = asyncio.Queue(max_pending)
+        self.overflowed = False
+
+    def put(self, event: TodoEvent):
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self) -> TodoEvent | None:
+        """The next event, or None (once) after events were dropped for this connection."""
+        if self.overflowed and self._queue.empty():
+            self.overflowed = False
+            return None
+        return await self._queue.get()
+
+
+class TodoEventHub:
+    """Fans each user's todo changes out to that user's open connections."""
+
+    def __init__(self, history_size: int, max_users: int, max_pending: int):
+        self.history_size = history_size
+        self.max_users = max_users
+        self.max_pending = max_pending
+        self._subscribers: dict[int, set[Subscription]] = {}
+        self._history: OrderedDict[int, deque[TodoEvent]] = OrderedDict()
+        self.published = 0
+
+    def publish(self, owner_id: int, version: int, changes: list[dict]) -> TodoEvent:
+        """Send `changes` to the user's connections; call after the write commits."""
+        data = json.dumps({"version": version, "changes": changes}, separators=(",", ":"))
+        event = TodoEvent(version, f"id: {version}\nevent: changes\ndata: {data}\n\n")
+        self.published += 1
+
+        history = self._history.get(owner_id)
+        if history is None:
+            history = self._history[owner_id] = deque(maxlen=self.history_size)
+        self._history.move_to_end(owner_id)
+        while len(self._history) > self.max_users:
+            self._history.popitem(last=False)
+        # Concurrent writes can commit and publish out of order
+        if history and history[-1].version > version:
+            events = list(history)
+            insort(events, event, key=lambda item: item.version)
+            history.clear()
+            history.extend(events)
+        else:
+            history.append(event)
+
+        for subscription in self._subscribers.get(owner_id, ()):
+            subscription.put(event)
+        return event
+
+    def replay(self, owner_id: int, after_version: int, current_version: int) -> list[TodoEvent] | None:
+        """Every kept event after `after_version`, or None if they don't reach `current_version` without a gap."""
+        if after_version > current_version:
+            # The page is from before the data was reset
+            return None
+        events = [event for event in self._history.get(owner_id, ()) if event.version > after_version]
+        versions = [event.version for event in events]
+        if versions != list(range(after_version + 1, after_version + 1 + len(versions))):
+            return None
+        if (versions[-1] if versions else after_version) < current_version:
+            return None
+        return events
+
+    @contextmanager
+    def subscribe(self, owner_id: int):
+        subscription = Subscription(self.max_pending)
+        self._subscribers.setdefault(owner_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscribers = self._subscribers[owner_id]
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[owner_id]
+
+    def stats(self) -> dict:
+        return {
+            "connections": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "users_connected": len(self._subscribers),
+            "users_with_history": len(self._history),
+            "published": self.published,
+        }
+
+
+async def event_stream(hub: TodoEventHub, owner_id: int, version: int, current_version: int,
+                       keepalive: float = TODO_EVENTS_KEEPALIVE_SECONDS, max_seconds: float = TODO_EVENTS_MAX_SECONDS):
+    """SSE body for a page at `version`: what it missed, then live events for up to `max_seconds`.
+
+    Changes that can't be accounted for (history too short, written through
+    another worker, dropped for a slow connection) produce a `stale` event;
+    live events keep flowing either way.
+    """
+    deadline = time.monotonic() + max_seconds
+    # Subscribe before replaying, so nothing published in between is lost
+    with hub.subscribe(owner_id) as subscription:
+        replayed = hub.replay(owner_id, version, current_version)
+        if replayed is None:
+            version = current_version
+            yield stale_message(version)
+        for event in replayed or ():
+            yield event.message
+            version = event.version
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                event = await asyncio.wait_for(subscription.get(), min(keepalive, remaining))
+            except asyncio.TimeoutError:
+                if time.monotonic() < deadline:
+                    yield KEEPALIVE_MESSAGE
+                continue
+            if event is None:
+                yield stale_message(version)
+                continue
+            if event.version <= version:
+                # Already covered by the replay
+                continue
+            if event.version != version + 1:
+                yield stale_message(event.version - 1)
+            yield event.message
+            version = event.version
+
+
+todo_events = TodoEventHub(TODO_EVENTS_HISTORY, TODO_EVENTS_MAX_USERS, TODO_EVENTS_MAX_PENDING)
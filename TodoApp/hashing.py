@@ -0,0 +1,84 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from starlette import status
+from TodoApp.metrics import password_hash_time
+
+bcrypt_context = CryptContext(schemes=['bcrypt'], deprecated="auto")
+
+# bcrypt releases the GIL, so a small thread pool runs hashes in parallel
+# without tying up the event loop.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+# Hash/verify calls allowed to be running or waiting before new ones are turned away
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 64))
+
+
+class PasswordHasher:
+    """Runs bcrypt hash/verify on a dedicated, size-limited thread pool.
+
+    Calls past `max_pending` are rejected with a 503 instead of queueing, so a
+    login burst only slows the endpoints that hash passwords.
+    """
+
+    def __init__(self, context: CryptContext, max_workers: int, max_pending: int):
+        self.context = context
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        # Threads are started by start() (from the app's lifespan) or on first use
+        self._executor: ThreadPoolExecutor | None = None
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+
+    async def warm_up(self):
+        """Start the threads and load the bcrypt backend before the first login needs it."""
+        self.start()
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.context.dummy_verify)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def _run(self, operation: str, func, *args):
+        if self.in_flight >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Too many password operations in progress.",
+                                headers={"Retry-After": "1"})
+        self.start()
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            password_hash_time.observe(time.perf_counter() - started, operation=operation)
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run("verify", self.context.verify, password, hashed_password)
+
+    def stats(self) -> dict:
+        """Current pool occupancy; `queued` is the work waiting for a free thread."""
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": self.in_flight,
+            "queued": max(0, self.in_flight - self.max_workers),
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+password_hasher = PasswordHasher(bcrypt_context, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
@@ -1,19 +1,36 @@
 from fastapi import FastAPI, Request, status
-from TodoApp.models import Base
-from TodoApp.database import engine
-from TodoApp.routers import auth, todos, admin, user
-from fastapi.staticfiles import StaticFiles
+from TodoApp.database import dispose_engines, init_database, warm_pool
+from TodoApp.hashing import password_hasher
+from TodoApp.routers import auth, todos, admin, user, internal
+from TodoApp.assets import AssetStaticFiles
 import os
-from fastapi.responses import RedirectResponse
-
-app = FastAPI()
-
-# Create tables (once) on startup. In production you’d use Alembic migrations.
-Base.metadata.create_all(bind=engine)
-
-
-
-app.mount("/static", StaticFiles(directory="TodoApp/static"), name="static")
+from fastapi.responses import RedirectResponse, PlainTextResponse
+from contextlib import asynccontextmanager
+from TodoApp.templating import precompile_templates
+from TodoApp.compression import CompressionMiddleware
+from TodoApp.metrics import MetricsMiddleware, render_metrics
+from TodoApp.replica import ReadYourWritesMiddleware
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Importing the app does no I/O; each worker fills its connection pool, compiles
+    # templates and loads bcrypt here, before serving. The schema is only created here
+    # when running single-process; TodoApp.serve creates it once before forking workers
+    await init_database()
+    await warm_pool()
+    precompile_templates()
+    await password_hasher.warm_up()
+    yield
+    password_hasher.shutdown()
+    await dispose_engines()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
+# Added last so it wraps everything, compression included
+app.add_middleware(MetricsMiddleware)
+
+app.mount("/static", AssetStaticFiles(directory="TodoApp/static"), name="static")
 
 @app.get("/")
 def test(request: Request):
@@ -23,9 +40,15 @@ def test(request: Request):
 def health_check():
     return {"status": "Healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 app.include_router(todos.router)
 app.include_router(auth.router)
 app.include_router(admin.router)
 app.include_router(user.router)
+app.include_router(internal.router)
 
-# start with uvicorn TodoApp.main:app --reload --env-file TodoApp/.env
+# Development: uvicorn TodoApp.main:app --reload --env-file TodoApp/.env
+# Production:  python -m TodoApp.serve (see TodoApp/serve.py)
@@ -0,0 +1,153 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+Each worker keeps its own numbers; scrape every worker (or put them behind
+one target per process) to get the full picture.
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from TodoApp.query_log import observe_query
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for name, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def collect(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{format_labels(key + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(key)} {series[-1]}")
+            lines.append(f"{self.name}_count{format_labels(key)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is read from a callback at scrape time."""
+
+    def __init__(self, name: str, documentation: str, read):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def collect(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge",
+                f"{self.name} {self.read()}"]
+
+
+REGISTRY: list = []
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.collect()) + "\n"
+
+
+request_latency = register(Histogram("http_request_duration_seconds", "Request latency by route template."))
+request_queries = register(Histogram("http_request_db_queries", "Database statements executed per request.", QUERY_COUNT_BUCKETS))
+request_db_time = register(Histogram("http_request_db_seconds", "Time spent in database statements per request."))
+password_hash_time = register(Histogram("password_hash_seconds", "Time spent hashing or verifying passwords, including queueing.",
+                                        (0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0, 5.0)))
+template_render_time = register(Histogram("template_render_seconds", "Time spent rendering page templates."))
+pool_wait_time = register(Histogram("db_pool_wait_seconds", "Time spent waiting to check out a pooled connection.",
+                                    (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)))
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_time", "scope")
+
+    def __init__(self, scope: Scope | None = None):
+        self.queries = 0
+        self.db_time = 0.0
+        self.scope = scope
+
+    @property
+    def route(self) -> str | None:
+        return route_label(self.scope) if self.scope is not None else None
+
+current_request_stats: ContextVar[RequestStats | None] = ContextVar("current_request_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+    observe_query(statement, parameters, executemany, elapsed, stats)
+
+
+def route_label(scope: Scope) -> str:
+    """The route template (e.g. /todos/todo/{todo_id}) so series don't explode per id."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Mounted apps such as /static set their mount point as root_path
+    return scope.get("root_path") or "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request_stats.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_request_stats.reset(token)
+            route = route_label(scope)
+            request_latency.observe(time.perf_counter() - started, method=scope["method"], route=route, status=str(status_code))
+            request_queries.observe(stats.queries, route=route)
+            request_db_time.observe(stats.db_time, route=route)
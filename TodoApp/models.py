@@ -1,5 +1,5 @@
 # Newer more modern approach - also this is consistent with how I am doing it in my personal site
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from TodoApp.database import Base
 
@@ -21,6 +21,14 @@ class Users(Base):
 
 class Todos(Base):
     __tablename__ = "todos"
+    # Every per-user query filters on owner_id; the rest of each index matches
+    # one filter/sort combination of the todo list, ending in id for the cursor
+    __table_args__ = (
+        Index("ix_todos_owner_id_id", "owner_id", "id"),
+        Index("ix_todos_owner_id_complete_id", "owner_id", "complete", "id"),
+        Index("ix_todos_owner_id_priority_id", "owner_id", "priority", "id"),
+        Index("ix_todos_owner_id_complete_priority_id", "owner_id", "complete", "priority", "id"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     title: Mapped[str] = mapped_column()
     description: Mapped[str] = mapped_column()
@@ -30,6 +38,27 @@ class Todos(Base):
     owner_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     owner: Mapped["Users"] = relationship(back_populates="todos")
 
+class TodoVersions(Base):
+    """Per-user data version, bumped by every todo write and used to derive ETags."""
+    __tablename__ = "todo_versions"
+    owner_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    version: Mapped[int] = mapped_column(default=0)
+
+class TodoCounters(Base):
+    """Per-user todo totals, kept in step with todo writes when TODO_STATS_COUNTERS is on."""
+    __tablename__ = "todo_counters"
+    owner_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    total: Mapped[int] = mapped_column(default=0)
+    completed: Mapped[int] = mapped_column(default=0)
+
+class RateLimitBuckets(Base):
+    """Token buckets for the database rate-limit backend, keyed by e.g. login:ip:<address>."""
+    __tablename__ = "rate_limit_buckets"
+    key: Mapped[str] = mapped_column(primary_key=True)
+    tokens: Mapped[float] = mapped_column()
+    updated_at: Mapped[float] = mapped_column()
+    allowed: Mapped[bool] = mapped_column()
+
 
 # # Instructor model
 
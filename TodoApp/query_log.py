@@ -0,0 +1,76 @@
+"""Query recording for tests and a slow-query log for production.
+
+Both hang off the cursor listeners in TodoApp.metrics, so every engine
+(sync, async, test overrides) is covered without extra wiring.
+"""
+import logging
+import os
+from dataclasses import dataclass
+
+# Statements slower than this are logged; 0 turns the log off
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+
+logger = logging.getLogger("TodoApp.slow_query")
+
+
+@dataclass
+class RecordedQuery:
+    statement: str
+    parameters: str
+    duration: float
+    route: str | None
+
+
+def parameter_shape(parameters, executemany: bool) -> str:
+    """Types of the bound parameters, never their values (passwords and emails go through here)."""
+    if executemany:
+        rows = list(parameters)
+        return f"{len(rows)} x {parameter_shape(rows[0], False)}" if rows else "0 rows"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+    return type(parameters).__name__
+
+
+class QueryRecorder:
+    """Collects every statement executed while active, from any thread.
+
+        with QueryRecorder() as recorder:
+            client.get("/todos/")
+        assert recorder.count <= 2
+    """
+
+    def __init__(self):
+        self.queries: list[RecordedQuery] = []
+
+    def __enter__(self):
+        _active_recorders.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _active_recorders.remove(self)
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def statements(self) -> list[str]:
+        return [query.statement for query in self.queries]
+
+_active_recorders: list[QueryRecorder] = []
+
+
+def observe_query(statement: str, parameters, executemany: bool, elapsed: float, stats):
+    """Called after every cursor execute; stats is the current RequestStats or None."""
+    slow = SLOW_QUERY_THRESHOLD_MS > 0 and elapsed * 1000 >= SLOW_QUERY_THRESHOLD_MS
+    if not slow and not _active_recorders:
+        return
+    query = RecordedQuery(statement, parameter_shape(parameters, executemany), elapsed,
+                          stats.route if stats is not None else None)
+    for recorder in _active_recorders:
+        recorder.queries.append(query)
+    if slow:
+        logger.warning("slow query %.1f ms route=%s params=%s: %s",
+                       elapsed * 1000, query.route, query.parameters, " ".join(statement.split()))
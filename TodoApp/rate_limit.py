@@ -0,0 +1,169 @@
+import math
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from fastapi import HTTPException, Request
+from sqlalchemy import case, delete
+from starlette import status
+from TodoApp.database import get_async_engine
+from TodoApp.etags import UPSERT_INSERTS
+from TodoApp.models import RateLimitBuckets
+
+# "memory" keeps buckets per worker; "database" shares them between workers and hosts
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+# Buckets kept by the memory backend before the least recently used are dropped
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+# Seconds between sweeps of fully refilled rows by the database backend
+RATE_LIMIT_PRUNE_SECONDS = float(os.getenv("RATE_LIMIT_PRUNE_SECONDS", 60))
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """A token bucket: `capacity` attempts in a burst, refilled evenly over `per_seconds`."""
+    capacity: int
+    per_seconds: float
+
+    @classmethod
+    def parse(cls, spec: str) -> "RateLimit":
+        """"5/60" is five attempts per minute; "0" turns the limit off."""
+        capacity, _, per_seconds = spec.partition("/")
+        return cls(int(capacity), float(per_seconds or 60))
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    @property
+    def refill_rate(self) -> float:
+        return self.capacity / self.per_seconds
+
+
+LOGIN_LIMIT_PER_USERNAME = RateLimit.parse(os.getenv("LOGIN_LIMIT_PER_USERNAME", "5/60"))
+LOGIN_LIMIT_PER_IP = RateLimit.parse(os.getenv("LOGIN_LIMIT_PER_IP", "20/60"))
+REGISTER_LIMIT_PER_IP = RateLimit.parse(os.getenv("REGISTER_LIMIT_PER_IP", "5/60"))
+REGISTER_LIMIT_PER_USERNAME = RateLimit.parse(os.getenv("REGISTER_LIMIT_PER_USERNAME", "3/60"))
+
+
+class MemoryBackend:
+    """Buckets in this process only; each worker enforces the limit on its own."""
+
+    name = "memory"
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def hit(self, key: str, limit: RateLimit, now: float) -> float:
+        """Take one token; returns 0 if allowed, else seconds until a token is available."""
+        tokens, updated_at = self._buckets.get(key, (limit.capacity, now))
+        tokens = min(limit.capacity, tokens + (now - updated_at) * limit.refill_rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return 0.0 if allowed else (1 - tokens) / limit.refill_rate
+
+    def clear(self):
+        self._buckets.clear()
+
+
+class DatabaseBackend:
+    """Buckets in the rate_limit_buckets table, shared by every worker on the database.
+
+    Each hit is a single upsert, so concurrent workers can't both spend the last token.
+    Rows untouched for longer than a full refill are swept out every
+    `prune_interval` seconds; a missing row is the same as a full bucket.
+    """
+
+    name = "database"
+
+    def __init__(self, async_engine=None, prune_interval: float = RATE_LIMIT_PRUNE_SECONDS):
+        # Defaults to the app's engine, created on first use
+        self.async_engine = async_engine
+        self.prune_interval = prune_interval
+        self._last_pruned = 0.0
+        # Longest refill window seen; older rows are full whatever their limit
+        self._longest_window = 0.0
+
+    async def hit(self, key: str, limit: RateLimit, now: float) -> float:
+        async_engine = self.async_engine or get_async_engine()
+        self._longest_window = max(self._longest_window, limit.per_seconds)
+        if now - self._last_pruned >= self.prune_interval:
+            self._last_pruned = now
+            await self.prune(now)
+        stmt = UPSERT_INSERTS[async_engine.dialect.name](RateLimitBuckets).values(
+            key=key, tokens=limit.capacity - 1, updated_at=now, allowed=True
+        )
+        refilled = RateLimitBuckets.tokens + (stmt.excluded.updated_at - RateLimitBuckets.updated_at) * limit.refill_rate
+        refilled = case((refilled > limit.capacity, float(limit.capacity)), else_=refilled)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[RateLimitBuckets.key],
+            set_={
+                "tokens": case((refilled >= 1, refilled - 1), else_=refilled),
+                "updated_at": stmt.excluded.updated_at,
+                "allowed": refilled >= 1,
+            },
+        ).returning(RateLimitBuckets.tokens, RateLimitBuckets.allowed)
+        async with async_engine.begin() as connection:
+            tokens, allowed = (await connection.execute(stmt)).one()
+        return 0.0 if allowed else (1 - tokens) / limit.refill_rate
+
+    async def prune(self, now: float) -> int:
+        """Delete buckets that have fully refilled; returns how many."""
+        async_engine = self.async_engine or get_async_engine()
+        async with async_engine.begin() as connection:
+            result = await connection.execute(
+                delete(RateLimitBuckets).where(RateLimitBuckets.updated_at < now - self._longest_window)
+            )
+        return result.rowcount
+
+    def clear(self):
+        pass
+
+
+BACKENDS = {"memory": lambda: MemoryBackend(RATE_LIMIT_MAX_KEYS), "database": DatabaseBackend}
+
+
+class RateLimiter:
+    """Turns requests away with a 429 once any of their buckets is empty.
+
+    Runs before any password work, so a rejected attempt costs one bucket
+    update and never reaches the hasher.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.allowed = 0
+        self.rejected = 0
+
+    async def enforce(self, *checks: tuple[str, RateLimit]):
+        for key, limit in checks:
+            if not limit.enabled:
+                continue
+            retry_after = await self.backend.hit(key, limit, time.time())
+            if retry_after > 0:
+                self.rejected += 1
+                raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                                    detail="Too many attempts. Try again later.",
+                                    headers={"Retry-After": str(math.ceil(retry_after))})
+        self.allowed += 1
+
+    def clear(self):
+        self.backend.clear()
+        self.allowed = 0
+        self.rejected = 0
+
+    def stats(self) -> dict:
+        return {"backend": self.backend.name, "allowed": self.allowed, "rejected": self.rejected}
+
+
+def client_ip(request: Request) -> str:
+    # Behind a proxy, run uvicorn with --proxy-headers so this is the real client
+    return request.client.host if request.client else "unknown"
+
+
+rate_limiter = RateLimiter(BACKENDS[RATE_LIMIT_BACKEND]())
@@ -0,0 +1,109 @@
+import os
+import time
+from collections import OrderedDict
+from fastapi import HTTPException, Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from TodoApp.database import get_async_session_local, get_replica_session_local
+from TodoApp.routers.auth import get_current_user
+
+# After a successful write, the same client reads from the primary for this
+# many seconds so it sees its own change despite replica lag; 0 disables
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", 5))
+PIN_COOKIE = "read_primary_until"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+# Users pinned by this worker before the least recently written are dropped
+READ_YOUR_WRITES_MAX_USERS = int(os.getenv("READ_YOUR_WRITES_MAX_USERS", 100000))
+
+
+class PrimaryPins:
+    """Users who wrote recently, pinned to the primary in this worker.
+
+    Covers token clients without a cookie jar; their keep-alive connection
+    usually stays on the worker that handled the write.
+    """
+
+    def __init__(self, max_users: int):
+        self.max_users = max_users
+        self._until: OrderedDict[int, float] = OrderedDict()
+
+    def pin(self, user_id: int, until: float):
+        self._until[user_id] = until
+        self._until.move_to_end(user_id)
+        while len(self._until) > self.max_users:
+            self._until.popitem(last=False)
+
+    def pinned(self, user_id: int, now: float) -> bool:
+        until = self._until.get(user_id)
+        if until is not None and until <= now:
+            del self._until[user_id]
+            return False
+        return until is not None
+
+    def __bool__(self) -> bool:
+        return bool(self._until)
+
+
+primary_pins = PrimaryPins(READ_YOUR_WRITES_MAX_USERS)
+
+
+async def request_user_id(request: Request) -> int | None:
+    """The user behind the bearer token or access_token cookie, if it is valid."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        token = request.cookies.get("access_token") or ""
+    if not token:
+        return None
+    try:
+        # Verified tokens are cached, so this is usually a dict lookup
+        return (await get_current_user(token)).get("user_id")
+    except HTTPException:
+        return None
+
+async def pinned_to_primary(request: Request) -> bool:
+    now = time.time()
+    try:
+        if float(request.cookies.get(PIN_COOKIE, 0)) > now:
+            return True
+    except ValueError:
+        pass
+    if not primary_pins:
+        return False
+    user_id = await request_user_id(request)
+    return user_id is not None and primary_pins.pinned(user_id, now)
+
+async def get_read_db(request: Request):
+    """Request-scoped session for read-only handlers: the replica, or the
+    primary while the client or user is pinned after a write."""
+    session_local = get_async_session_local() if await pinned_to_primary(request) else get_replica_session_local()
+    async with session_local() as db:
+        yield db
+
+
+class ReadYourWritesMiddleware:
+    """Pins a client to the primary after a successful write.
+
+    Twice: a short-lived cookie, which holds whichever worker serves the
+    next request, and a per-user pin in this worker for clients that send
+    a bearer token and keep no cookies.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS or READ_YOUR_WRITES_SECONDS <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_pin(message: Message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                pinned_until = time.time() + READ_YOUR_WRITES_SECONDS
+                user_id = await request_user_id(Request(scope))
+                if user_id is not None:
+                    primary_pins.pin(user_id, pinned_until)
+                cookie = (f"{PIN_COOKIE}={pinned_until:.3f}; Max-Age={int(READ_YOUR_WRITES_SECONDS) or 1}; "
+                          "Path=/; HttpOnly; SameSite=Lax")
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        await self.app(scope, receive, send_with_pin)
@@ -1,11 +1,18 @@
-from typing import Annotated
-from sqlalchemy.orm import Session
-from fastapi import APIRouter, Depends, HTTPException, Path, Body
+from typing import Annotated, Literal
+import json
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, HTTPException, Path, Body, Query
+from fastapi.responses import StreamingResponse
 from TodoApp.models import Todos
-from TodoApp.schemas import TodoRequest
-from TodoApp.database import SessionLocal
+from TodoApp.schemas import TodoResponse, json_bytes_response, todo_list_adapter
+from TodoApp.database import get_db
+from TodoApp.replica import get_read_db
 from starlette import status
 from TodoApp.routers.auth import get_current_user
+from TodoApp.stats import adjust_todo_counters
+from TodoApp.etags import bump_todo_version
+from TodoApp.events import deleted, todo_events
 
 
 router = APIRouter(
@@ -13,32 +20,54 @@ router = APIRouter(
     tags=["admin"]
 )
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# A type alias for dependency injection: Session provided by get_db()
-db_dependency = Annotated[Session, Depends(get_db)]
+# A type alias for dependency injection: AsyncSession provided by get_db()
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+# Read-only handlers: the replica, or the primary right after this client wrote
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
-@router.get("/todo", status_code=status.HTTP_200_OK)
-async def read_all(user: user_dependency, db: db_dependency):
+# Rows fetched per round-trip when streaming the todo table
+EXPORT_CHUNK_SIZE = 1000
+
+async def stream_todos_ndjson(db: AsyncSession):
+    """Yield every todo as newline-delimited JSON, reading the table in fixed-size chunks.
+
+    Runs on its own connection with a server-side cursor and plain column rows
+    (no ORM identity map), so memory stays bounded by the chunk size.
+    """
+    stmt = select(Todos.id, Todos.title, Todos.description, Todos.priority,
+                  Todos.complete, Todos.owner_id).order_by(Todos.id)
+    # The request's session is closed before the body is streamed, so use a
+    # dedicated connection from the same engine for the lifetime of the export.
+    async with db.bind.connect() as connection: # type: ignore
+        result = await connection.stream(stmt.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+        async for chunk in result.partitions():
+            yield "".join(json.dumps(row._asdict()) + "\n" for row in chunk)
+
+@router.get("/todo", status_code=status.HTTP_200_OK, response_model=list[TodoResponse])
+async def read_all(user: user_dependency, db: read_db_dependency,
+                   response_format: Literal["json", "ndjson"] = Query(default="json", alias="format")):
     if user is None or user.get("user_role") != 'admin':
         raise HTTPException(status_code=401, detail=f"Authentication failed {user}")
 
-    return db.query(Todos).all()
+    if response_format == "ndjson":
+        return StreamingResponse(stream_todos_ndjson(db), media_type="application/x-ndjson")
+
+    return json_bytes_response(todo_list_adapter, (await db.scalars(select(Todos))).all())
 
 @router.delete("/todo/{todo_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_todo(user: user_dependency, db: db_dependency, todo_id: int = Path(gt=0)):
     if user is None or user.get("user_role") != "admin":
         raise HTTPException(status_code=401, detail=f"Authentication failed {user}")
     
-    todo_model = db.query(Todos).filter(Todos.id == todo_id).first()
-    if todo_model is None:
+    removed = (await db.execute(
+        delete(Todos).where(Todos.id == todo_id)
+        .returning(Todos.owner_id, Todos.complete).execution_options(synchronize_session=False)
+    )).first()
+    if removed is None:
         raise HTTPException(status_code=404, detail="Todo not found")
     
-    db.delete(todo_model)
-    db.commit()
+    await adjust_todo_counters(db, removed.owner_id, total=-1, completed=-int(removed.complete))
+    version = await bump_todo_version(db, removed.owner_id)
+    await db.commit()
+    todo_events.publish(removed.owner_id, version, [deleted(todo_id)])
@@ -1,17 +1,21 @@
 from fastapi import APIRouter, Body, Depends, HTTPException, Request
 from TodoApp.models import Users
 from TodoApp.schemas import CreateUserRequest, Token
-from passlib.context import CryptContext
 from typing import Annotated, cast
-from sqlalchemy.orm import Session
-from TodoApp.database import SessionLocal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from TodoApp.database import get_db
+from TodoApp.hashing import bcrypt_context, password_hasher
+from TodoApp.token_cache import token_cache
+from TodoApp.rate_limit import (LOGIN_LIMIT_PER_IP, LOGIN_LIMIT_PER_USERNAME, REGISTER_LIMIT_PER_IP,
+                                REGISTER_LIMIT_PER_USERNAME, client_ip, rate_limiter)
 from starlette import status
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from jose import jwt, JWTError
 from dotenv import load_dotenv
 import os
 from datetime import timedelta, datetime, timezone
-from fastapi.templating import Jinja2Templates
+from TodoApp.templating import templates
 
 load_dotenv()
 
@@ -23,21 +27,11 @@ router = APIRouter(
     tags=["auth"]
 )
 
-bcrypt_context = CryptContext(schemes=['bcrypt'], deprecated="auto")
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl='auth/token')
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# A type alias for dependency injection: Session provided by get_db()
-db_dependency = Annotated[Session, Depends(get_db)]
-
-templates = Jinja2Templates(directory="TodoApp/templates")
+# A type alias for dependency injection: AsyncSession provided by get_db()
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
 
 ### Pages ### 
 
@@ -50,11 +44,11 @@ def render_register_page(request: Request):
     return templates.TemplateResponse("register.html", {"request": request})
 
 ### Functions ###
-def authenticate_user(username: str, password: str, db):
-    user = db.query(Users).filter(Users.username == username).first()
+async def authenticate_user(username: str, password: str, db: AsyncSession):
+    user = await db.scalar(select(Users).where(Users.username == username))
     if not user:
         return False
-    if not bcrypt_context.verify(password, user.hashed_password):
+    if not await password_hasher.verify(password, user.hashed_password):
         return False
     return user
 
@@ -65,6 +59,10 @@ def create_access_token(username: str, user_id: int, role: str, expires_delta: t
     return jwt.encode(encode, secret_key, algorithm=algorithm)
 
 async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
+    # Repeat calls with a token we already verified skip the signature check
+    cached_user = token_cache.get(token)
+    if cached_user is not None:
+        return dict(cached_user)
     try:
         payload = jwt.decode(token, secret_key, algorithms=[algorithm])
         username: str = payload.get('sub') # type: ignore
@@ -73,32 +71,49 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
         if username is None or user_id is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                 detail="Could not validate user.")
-        return {"username": username, "user_id": user_id, "user_role": user_role}
+        current_user = {"username": username, "user_id": user_id, "user_role": user_role}
+        # Only tokens that expire are cached, and only until they do
+        expires_at = payload.get("exp")
+        if isinstance(expires_at, (int, float)):
+            token_cache.put(token, current_user, expires_at)
+        return dict(current_user)
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate user.")
 
 ### Endpoints ###
 @router.post("/", status_code=status.HTTP_201_CREATED)
-async def create_user(db: db_dependency, create_user_request: CreateUserRequest = Body(...)):
+async def create_user(request: Request, db: db_dependency, create_user_request: CreateUserRequest = Body(...)):
+    # Per username too, so probing one name from many addresses is throttled as well
+    await rate_limiter.enforce(
+        (f"register:ip:{client_ip(request)}", REGISTER_LIMIT_PER_IP),
+        (f"register:user:{create_user_request.username.strip().lower()}", REGISTER_LIMIT_PER_USERNAME),
+    )
+    hashed_password = await password_hasher.hash(create_user_request.password)
     create_user_model = Users(
         email=create_user_request.email,
         username=create_user_request.username,
         first_name=create_user_request.first_name,
         last_name=create_user_request.last_name,
         role = create_user_request.role,
-        hashed_password=bcrypt_context.hash(create_user_request.password),
+        hashed_password=hashed_password,
         is_active=True,
         phone_number=create_user_request.phone_number
     )
 
     db.add(create_user_model)
-    db.commit()
+    await db.commit()
 
 @router.post("/token", response_model=Token)
-async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+async def login_for_access_token(request: Request,
+                                 form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
                                  db: db_dependency
                                  ):
-    user = authenticate_user(form_data.username, form_data.password, db)
+    # Throttle before the user lookup and bcrypt verify
+    await rate_limiter.enforce(
+        (f"login:ip:{client_ip(request)}", LOGIN_LIMIT_PER_IP),
+        (f"login:user:{form_data.username.strip().lower()}", LOGIN_LIMIT_PER_USERNAME),
+    )
+    user = await authenticate_user(form_data.username, form_data.password, db)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail="Could not validate user.")
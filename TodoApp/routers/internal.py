@@ -0,0 +1,51 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends, HTTPException
+from starlette import status
+from TodoApp.routers.auth import get_current_user
+from TodoApp.database import get_async_engine, pool_status
+from TodoApp.hashing import password_hasher
+from TodoApp.token_cache import token_cache
+from TodoApp.rate_limit import rate_limiter
+from TodoApp.events import todo_events
+
+router = APIRouter(
+    prefix="/internal",
+    tags=["internal"]
+)
+
+user_dependency = Annotated[dict, Depends(get_current_user)]
+
+@router.get("/pool", status_code=status.HTTP_200_OK)
+async def read_pool_stats(user: user_dependency):
+    """Connection pool occupancy and checkout wait times"""
+    if user is None or user.get("user_role") != "admin":
+        raise HTTPException(status_code=401, detail=f"Authentication failed {user}")
+    return pool_status(get_async_engine())
+
+@router.get("/hasher", status_code=status.HTTP_200_OK)
+async def read_hasher_stats(user: user_dependency):
+    """Occupancy of the password hashing pool"""
+    if user is None or user.get("user_role") != "admin":
+        raise HTTPException(status_code=401, detail=f"Authentication failed {user}")
+    return password_hasher.stats()
+
+@router.get("/token-cache", status_code=status.HTTP_200_OK)
+async def read_token_cache_stats(user: user_dependency):
+    """Size and hit/miss counters of the verified-token cache"""
+    if user is None or user.get("user_role") != "admin":
+        raise HTTPException(status_code=401, detail=f"Authentication failed {user}")
+    return token_cache.stats()
+
+@router.get("/rate-limit", status_code=status.HTTP_200_OK)
+async def read_rate_limit_stats(user: user_dependency):
+    """Login and registration attempts let through or turned away"""
+    if user is None or user.get("user_role") != "admin":
+        raise HTTPException(status_code=401, detail=f"Authentication failed {user}")
+    return rate_limiter.stats()
+
+@router.get("/events", status_code=status.HTTP_200_OK)
+async def read_event_hub_stats(user: user_dependency):
+    """Open todo event streams and events published by this worker"""
+    if user is None or user.get("user_role") != "admin":
+        raise HTTPException(status_code=401, detail=f"Authentication failed {user}")
+    return todo_events.stats()
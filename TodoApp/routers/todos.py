@@ -1,15 +1,21 @@
-from typing import Annotated
-from sqlalchemy.orm import Session
-from fastapi import APIRouter, Depends, HTTPException, Path, Body, Request
+from typing import Annotated, Literal
+from sqlalchemy import delete, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, HTTPException, Path, Body, Request, Response, Query
+from fastapi.responses import StreamingResponse
 from TodoApp.models import Todos
-from TodoApp.schemas import TodoRequest
-from TodoApp.database import SessionLocal
+from TodoApp.schemas import (TodoRequest, TodoBatchRequest, TodoPage, TodoResponse, TodoSearchPage, json_bytes_response,
+                             todo_page_adapter, todo_search_page_adapter)
+from TodoApp.database import get_db
+from TodoApp.replica import get_read_db
 from starlette import status
 from TodoApp.routers.auth import get_current_user
+from TodoApp.stats import adjust_todo_counters, counters_enabled, read_todo_stats
+from TodoApp.etags import bump_todo_version, check_not_modified, read_todo_version
+from TodoApp.search import search_todos
+from TodoApp.events import TODO_EVENTS_MAX_SECONDS, deleted, event_stream, todo_events, upserted
 from starlette.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
-
-templates = Jinja2Templates(directory="TodoApp/templates")
+from TodoApp.templating import templates
 
 
 router = APIRouter(
@@ -17,25 +23,72 @@ router = APIRouter(
     tags=["todos"]
 )
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# A type alias for dependency injection: Session provided by get_db()
-db_dependency = Annotated[Session, Depends(get_db)]
+# A type alias for dependency injection: AsyncSession provided by get_db()
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+# Read-only handlers: the replica, or the primary right after this client wrote
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
+# Keyset pagination defaults for the todo list (API and page)
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Sortable columns; a leading "-" sorts descending
+TodoSort = Literal["id", "-id", "priority", "-priority"]
+
 def redirect_to_login():
     redirect_response = RedirectResponse(url="/auth/login-page", status_code=status.HTTP_302_FOUND)
     redirect_response.delete_cookie(key="access_token")
     return redirect_response
 
+def encode_cursor(todo, sort: TodoSort) -> str:
+    """The next-page cursor: the last todo's sort key, so the page continues from it even once that todo changes."""
+    return f"{todo.priority}:{todo.id}" if sort.lstrip("-") == "priority" else str(todo.id)
+
+def decode_cursor(after: str, sort: TodoSort) -> tuple[int, ...]:
+    parts = after.split(":")
+    if len(parts) != (2 if sort.lstrip("-") == "priority" else 1) or not all(part.isdigit() for part in parts):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid cursor.")
+    return tuple(int(part) for part in parts)
+
+async def fetch_todo_page(db: AsyncSession, owner_id: int, limit: int, after: str | None = None,
+                          complete: bool | None = None, priority: int | None = None, sort: TodoSort = "id"):
+    """Return one page of a user's todos, filtered and sorted, plus the cursor for the next page.
+
+    Uses keyset pagination: `after` is the cursor of the previous page, the
+    sort key of the last todo seen, and the page continues from that position
+    in the sort order. Every filter and sort combination has a matching
+    (owner_id, ...) index, so the cost of a page does not depend on how far
+    into the list it is.
+    """
+    query = select(Todos).where(Todos.owner_id == owner_id)
+    if complete is not None:
+        query = query.where(Todos.complete == complete)
+    if priority is not None:
+        query = query.where(Todos.priority == priority)
+
+    descending = sort.startswith("-")
+    # id breaks ties so the order (and with it the cursor) is total
+    keys = (Todos.priority, Todos.id) if sort.lstrip("-") == "priority" else (Todos.id,)
+    if after is not None:
+        cursor = decode_cursor(after, sort)
+        position = tuple_(*keys) if len(keys) > 1 else keys[0]
+        value = tuple_(*cursor) if len(cursor) > 1 else cursor[0]
+        query = query.where(position < value if descending else position > value) # type: ignore
+    query = query.order_by(*(key.desc() if descending else key for key in keys))
+
+    # Fetch one extra row to know whether another page exists
+    rows = (await db.scalars(query.limit(limit + 1))).all()
+    next_cursor = encode_cursor(rows[limit - 1], sort) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
 ### Pages
 @router.get("/todo-page")
-async def render_todo_page(request: Request, db: db_dependency):
+async def render_todo_page(
+                        request: Request,
+                        db: read_db_dependency,
+                        limit: int = Query(default=DEFAULT_PAGE_SIZE, gt=0, le=MAX_PAGE_SIZE),
+                        after: str | None = Query(default=None, max_length=32)
+                    ):
     try:
         access_token = request.cookies.get("access_token") or ""
         user = await get_current_user(access_token)
@@ -43,9 +96,15 @@ async def render_todo_page(request: Request, db: db_dependency):
         if user is None:
             return redirect_to_login()
         
-        todos = db.query(Todos).filter(Todos.owner_id == user.get("user_id")).all()
+        # Row fragments are cached per data version, so any write re-renders them. The version is
+        # read first, so a write committing in between can't get old rows cached under its version
+        data_version = await read_todo_version(db, user.get("user_id")) # type: ignore
+        todos, next_cursor = await fetch_todo_page(db, user.get("user_id"), limit, after) # type: ignore
 
-        return templates.TemplateResponse("todo.html", {"request": request, "todos": todos, "user": user})
+        return templates.TemplateResponse("todo.html", {
+            "request": request, "todos": todos, "user": user, "data_version": data_version,
+            "limit": limit, "after": after, "next_cursor": next_cursor
+        })
 
     except:
         return redirect_to_login()
@@ -65,7 +124,7 @@ async def render_add_todo_page(request: Request):
         return redirect_to_login()
 
 @router.get("/edit-todo-page/{todo_id}")
-async def render_edit_todo_page(request: Request, todo_id: int, db: db_dependency):
+async def render_edit_todo_page(request: Request, todo_id: int, db: read_db_dependency):
     try:
         access_token = request.cookies.get("access_token") or ""
         user = await get_current_user(access_token)
@@ -73,7 +132,7 @@ async def render_edit_todo_page(request: Request, todo_id: int, db: db_dependenc
         if user is None:
             return redirect_to_login()       
 
-        todo = db.query(Todos).filter(Todos.id == todo_id).first()
+        todo = await db.scalar(select(Todos).where(Todos.id == todo_id))
 
         return templates.TemplateResponse("edit-todo.html", {"request": request, "todo": todo, "user": user})
     
@@ -82,21 +141,67 @@ async def render_edit_todo_page(request: Request, todo_id: int, db: db_dependenc
         
         
 ### Endpoints
-@router.get("/", status_code=status.HTTP_200_OK)
-async def read_all(user: user_dependency, db: db_dependency):
+@router.get("/", status_code=status.HTTP_200_OK, response_model=TodoPage)
+async def read_all(
+                        request: Request,
+                        response: Response,
+                        user: user_dependency,
+                        db: read_db_dependency,
+                        limit: int = Query(default=DEFAULT_PAGE_SIZE, gt=0, le=MAX_PAGE_SIZE),
+                        after: str | None = Query(default=None, max_length=32),
+                        complete: bool | None = Query(default=None),
+                        priority: int | None = Query(default=None, gt=0, lt=6),
+                        sort: TodoSort = Query(default="id")
+                    ):
+    """List the user's todos one page at a time, optionally filtered by `complete` and `priority`.
+
+    Sort by `id` or `priority`, prefixed with `-` for descending. Pass
+    `next_cursor` back as `after`, with the same filters and sort, to get the next page.
+    """
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed.")
+    not_modified = await check_not_modified(request, response, db, user.get("user_id")) # type: ignore
+    if not_modified is not None:
+        return not_modified
+    todos, next_cursor = await fetch_todo_page(db, user.get("user_id"), limit, after, complete, priority, sort) # type: ignore
+    return json_bytes_response(todo_page_adapter, {"todos": todos, "next_cursor": next_cursor}, headers=response.headers)
+
+@router.get("/search", status_code=status.HTTP_200_OK, response_model=TodoSearchPage)
+async def search(
+                        request: Request,
+                        response: Response,
+                        user: user_dependency,
+                        db: read_db_dependency,
+                        q: str = Query(min_length=1, max_length=200),
+                        limit: int = Query(default=DEFAULT_PAGE_SIZE, gt=0, le=MAX_PAGE_SIZE),
+                        offset: int = Query(default=0, ge=0)
+                    ):
+    """Full-text search over the user's todo titles and descriptions, best matches first.
+
+    Pass `next_offset` back as `offset` to get the next page.
+    """
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed.")
-    return db.query(Todos).filter(Todos.owner_id == user.get("user_id")).all()
+    not_modified = await check_not_modified(request, response, db, user.get("user_id")) # type: ignore
+    if not_modified is not None:
+        return not_modified
+    todos, next_offset = await search_todos(db, user.get("user_id"), q, limit, offset) # type: ignore
+    return json_bytes_response(todo_search_page_adapter, {"todos": todos, "next_offset": next_offset}, headers=response.headers)
 
-@router.get("/todo/{todo_id}", status_code=status.HTTP_200_OK)
+@router.get("/todo/{todo_id}", status_code=status.HTTP_200_OK, response_model=TodoResponse)
 async def read_todo(
+                        request: Request,
+                        response: Response,
                         user: user_dependency,
-                        db: db_dependency, 
+                        db: read_db_dependency, 
                         todo_id: int = Path(gt=0)
                     ):
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed.")
-    todo_model = db.query(Todos).filter(Todos.id == todo_id).filter(Todos.owner_id == user.get("user_id")).first()
+    not_modified = await check_not_modified(request, response, db, user.get("user_id")) # type: ignore
+    if not_modified is not None:
+        return not_modified
+    todo_model = await db.scalar(select(Todos).where(Todos.id == todo_id, Todos.owner_id == user.get("user_id")))
     if todo_model is not None:
         return todo_model
     raise HTTPException(status_code=404, detail="Todo not found.")
@@ -113,7 +218,10 @@ async def create_todo(
     todo_model = Todos(**todo_request.model_dump(), owner_id=user.get("user_id"))
 
     db.add(todo_model)
-    db.commit()
+    await adjust_todo_counters(db, todo_model.owner_id, total=1, completed=int(todo_model.complete))
+    version = await bump_todo_version(db, todo_model.owner_id)
+    await db.commit()
+    todo_events.publish(todo_model.owner_id, version, [upserted({"id": todo_model.id, **todo_request.model_dump()})]) # type: ignore
 
 @router.put("/todo/{todo_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def update_todo(
@@ -124,17 +232,25 @@ async def update_todo(
                     ):
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed.")
-    todo_model = db.query(Todos).filter(Todos.id == todo_id).filter(Todos.owner_id == user.get("user_id")).first()
-    if todo_model is None:
+    owned_todo = (Todos.id == todo_id, Todos.owner_id == user.get("user_id"))
+
+    # RETURNING only gives the new row, so the counters need the old flag read first
+    was_complete = None
+    if counters_enabled():
+        was_complete = await db.scalar(select(Todos.complete).where(*owned_todo).with_for_update())
+
+    updated = (await db.execute(
+        update(Todos).where(*owned_todo).values(**todo_request.model_dump())
+        .returning(Todos.owner_id).execution_options(synchronize_session=False)
+    )).first()
+    if updated is None:
         raise HTTPException(status_code=404, detail="Todo not found")
-    
-    todo_model.title = todo_request.title
-    todo_model.description = todo_request.description
-    todo_model.priority = todo_request.priority
-    todo_model.complete = todo_request.complete
 
-    db.add(todo_model)
-    db.commit()
+    if was_complete is not None:
+        await adjust_todo_counters(db, updated.owner_id, completed=int(todo_request.complete) - int(was_complete))
+    version = await bump_todo_version(db, updated.owner_id)
+    await db.commit()
+    todo_events.publish(updated.owner_id, version, [upserted({"id": todo_id, **todo_request.model_dump()})])
 
 @router.delete("/todo/{todo_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_todo(
@@ -144,12 +260,17 @@ async def delete_todo(
                     ):
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed.")
-    todo_model = db.query(Todos).filter(Todos.id == todo_id).filter(Todos.owner_id == user.get("user_id")).first()
-    if todo_model is None:
+    removed = (await db.execute(
+        delete(Todos).where(Todos.id == todo_id, Todos.owner_id == user.get("user_id"))
+        .returning(Todos.owner_id, Todos.complete).execution_options(synchronize_session=False)
+    )).first()
+    if removed is None:
         raise HTTPException(status_code=404, detail="Todo not found")
     
-    db.delete(todo_model)
-    db.commit()
+    await adjust_todo_counters(db, removed.owner_id, total=-1, completed=-int(removed.complete))
+    version = await bump_todo_version(db, removed.owner_id)
+    await db.commit()
+    todo_events.publish(removed.owner_id, version, [deleted(todo_id)])
 
 @router.patch("/todo/{todo_id}/toggle", status_code=status.HTTP_200_OK)
 async def toggle_todo_completion(
@@ -160,24 +281,103 @@ async def toggle_todo_completion(
     """Toggle the completion status of a todo item"""
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed.")
-    todo_model = db.query(Todos).filter(Todos.id == todo_id).filter(Todos.owner_id == user.get("user_id")).first()
-    if todo_model is None:
+    toggled = (await db.execute(
+        update(Todos).where(Todos.id == todo_id, Todos.owner_id == user.get("user_id"))
+        .values(complete=~Todos.complete)
+        .returning(Todos.id, Todos.owner_id, Todos.complete, Todos.title).execution_options(synchronize_session=False)
+    )).first()
+    if toggled is None:
         raise HTTPException(status_code=404, detail="Todo not found")
     
-    todo_model.complete = not todo_model.complete
-    db.add(todo_model)
-    db.commit()
-    return {"id": todo_model.id, "complete": todo_model.complete, "message": "Todo status updated successfully"}
+    await adjust_todo_counters(db, toggled.owner_id, completed=1 if toggled.complete else -1)
+    version = await bump_todo_version(db, toggled.owner_id)
+    await db.commit()
+    todo_events.publish(toggled.owner_id, version, [upserted(toggled._asdict())])
+    return {"id": toggled.id, "complete": toggled.complete, "message": "Todo status updated successfully"}
+
+@router.post("/batch", status_code=status.HTTP_200_OK)
+async def apply_todo_batch(
+                        user: user_dependency,
+                        db: db_dependency,
+                        batch_request: TodoBatchRequest = Body(...)
+                    ):
+    """Apply many creates, updates and deletes in one transaction.
+
+    Each kind of operation is sent as a single bulk statement. Results come
+    back in request order; updates and deletes of todos the user doesn't own
+    are reported as 404 and skipped.
+    """
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed.")
+    owner_id = user.get("user_id")
+    operations = batch_request.operations
+
+    # One lookup for every id the batch touches
+    referenced_ids = [operation.id for operation in operations if operation.id is not None]
+    was_complete = {}
+    if referenced_ids:
+        query = select(Todos.id, Todos.complete).where(Todos.owner_id == owner_id, Todos.id.in_(referenced_ids))
+        if counters_enabled():
+            # The completed delta is worked out from these flags, so no other write may change them first
+            query = query.with_for_update()
+        rows = await db.execute(query)
+        was_complete = {todo_id: complete for todo_id, complete in rows}
+
+    creates = [operation for operation in operations if operation.op == "create"]
+    updates = [operation for operation in operations if operation.op == "update" and operation.id in was_complete]
+    deletes = [operation for operation in operations if operation.op == "delete" and operation.id in was_complete]
+
+    created_ids = []
+    if creates:
+        created_ids = (await db.scalars(
+            insert(Todos).returning(Todos.id, sort_by_parameter_order=True),
+            [{**operation.todo.model_dump(), "owner_id": owner_id} for operation in creates] # type: ignore
+        )).all()
+    if updates:
+        await db.execute(update(Todos), [{"id": operation.id, **operation.todo.model_dump()} for operation in updates]) # type: ignore
+    if deletes:
+        await db.execute(
+            delete(Todos).where(Todos.owner_id == owner_id, Todos.id.in_([operation.id for operation in deletes]))
+        )
+
+    completed_delta = (
+        sum(operation.todo.complete for operation in creates) # type: ignore
+        + sum(operation.todo.complete - was_complete[operation.id] for operation in updates) # type: ignore
+        - sum(was_complete[operation.id] for operation in deletes)
+    )
+    await adjust_todo_counters(db, owner_id, total=len(creates) - len(deletes), completed=completed_delta) # type: ignore
+    version = None
+    if creates or updates or deletes:
+        version = await bump_todo_version(db, owner_id) # type: ignore
+    await db.commit()
+    if version is not None:
+        todo_events.publish(owner_id, version, [ # type: ignore
+            *(upserted({"id": todo_id, **operation.todo.model_dump()}) for todo_id, operation in zip(created_ids, creates)), # type: ignore
+            *(upserted({"id": operation.id, **operation.todo.model_dump()}) for operation in updates), # type: ignore
+            *(deleted(operation.id) for operation in deletes), # type: ignore
+        ])
+
+    new_ids = iter(created_ids)
+    results = []
+    for operation in operations:
+        if operation.op == "create":
+            results.append({"op": "create", "id": next(new_ids), "status": status.HTTP_201_CREATED})
+        elif operation.id in was_complete:
+            results.append({"op": operation.op, "id": operation.id, "status": status.HTTP_204_NO_CONTENT})
+        else:
+            results.append({"op": operation.op, "id": operation.id, "status": status.HTTP_404_NOT_FOUND})
+    return {"results": results}
 
 @router.get("/stats", status_code=status.HTTP_200_OK)
-async def get_todo_stats(user: user_dependency, db: db_dependency):
+async def get_todo_stats(request: Request, response: Response, user: user_dependency, db: read_db_dependency):
     """Get statistics about user's todos"""
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed.")
+    not_modified = await check_not_modified(request, response, db, user.get("user_id")) # type: ignore
+    if not_modified is not None:
+        return not_modified
     
-    user_todos = db.query(Todos).filter(Todos.owner_id == user.get("user_id")).all()
-    total_todos = len(user_todos)
-    completed_todos = len([todo for todo in user_todos if todo.complete])
+    total_todos, completed_todos = await read_todo_stats(db, user.get("user_id")) # type: ignore
     pending_todos = total_todos - completed_todos
     completion_rate = (completed_todos / total_todos * 100) if total_todos > 0 else 0
     
@@ -186,4 +386,24 @@ async def get_todo_stats(user: user_dependency, db: db_dependency):
         "completed_todos": completed_todos,
         "pending_todos": pending_todos,
         "completion_rate": round(completion_rate, 2)
-    }
\ No newline at end of file
+    }
+
+@router.get("/events")
+async def stream_todo_events(request: Request, db: read_db_dependency, version: int = Query(default=0, ge=0)):
+    """Server-Sent Events with the user's todo changes, so the todo page can patch itself in place.
+
+    `version` is the data version the page was rendered at; a reconnecting
+    browser sends the id of the last event it got instead. Authenticates with
+    the access_token cookie, since EventSource can't set headers.
+    """
+    user = await get_current_user(request.cookies.get("access_token") or "")
+    owner_id = user.get("user_id")
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        version = int(last_event_id)
+    # Same routing as the page render, so a lagging replica doesn't look like missed changes
+    current_version = await read_todo_version(db, owner_id) # type: ignore
+    return StreamingResponse(event_stream(todo_events, owner_id, version, current_version, # type: ignore
+                                          max_seconds=TODO_EVENTS_MAX_SECONDS),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -1,57 +1,54 @@
 from typing import Annotated
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import APIRouter, Depends, HTTPException, Path, Body
 from TodoApp.models import Users
-from TodoApp.schemas import UserVerifcation
-from TodoApp.database import SessionLocal
+from TodoApp.schemas import UserResponse, UserVerifcation
+from TodoApp.database import get_db
+from TodoApp.replica import get_read_db
 from starlette import status
 from TodoApp.routers.auth import get_current_user
-from passlib.context import CryptContext
+from TodoApp.hashing import password_hasher
 
 router = APIRouter(
     prefix="/user",
     tags=["user"]
 )
 
-bcrypt_context = CryptContext(schemes=['bcrypt'], deprecated="auto")
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# A type alias for dependency injection: Session provided by get_db()
-db_dependency = Annotated[Session, Depends(get_db)]
+# A type alias for dependency injection: AsyncSession provided by get_db()
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+# Read-only handlers: the replica, or the primary right after this client wrote
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
-@router.get("/", status_code=status.HTTP_200_OK)
-async def get_users(user: user_dependency, db: db_dependency):
+@router.get("/", status_code=status.HTTP_200_OK, response_model=UserResponse)
+async def get_users(user: user_dependency, db: read_db_dependency):
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed.")
-    return db.query(Users).filter(Users.id == user.get("user_id")).first()
+    user_model = await db.get(Users, user.get("user_id"))
+    if user_model is None:
+        raise HTTPException(status_code=404, detail="User not found.")
+    return user_model
     
 
 @router.put("/password", status_code=status.HTTP_204_NO_CONTENT)
 async def change_password(user: user_dependency, db: db_dependency, user_verification: UserVerifcation = Body(...)):
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed.")
-    user_model = db.query(Users).filter(Users.id == user.get("user_id")).first()
+    user_model = await db.get(Users, user.get("user_id"))
     
-    if not bcrypt_context.verify(user_verification.password, user_model.hashed_password): # type: ignore
+    if not await password_hasher.verify(user_verification.password, user_model.hashed_password): # type: ignore
         raise HTTPException(status_code=401, detail="Error on password change.")
 
-    user_model.hashed_password = bcrypt_context.hash(user_verification.new_password) # type: ignore
+    user_model.hashed_password = await password_hasher.hash(user_verification.new_password) # type: ignore
     db.add(user_model)
-    db.commit()
+    await db.commit()
     
 @router.put("/phone_number", status_code=status.HTTP_204_NO_CONTENT)
 async def update_phone_number(user: user_dependency, db: db_dependency, phone_number: str = Body(...)):
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed.")
-    user_model = db.query(Users).filter(Users.id == user.get("user_id")).first()
+    user_model = await db.get(Users, user.get("user_id"))
     user_model.phone_number = phone_number # type: ignore
     db.add(user_model)
-    db.commit()
+    await db.commit()
     
\ No newline at end of file
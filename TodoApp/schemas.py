@@ -1,4 +1,6 @@
-from pydantic import BaseModel, Field
+from typing import Any, Literal
+from fastapi import Response
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, model_validator
 
 class TodoRequest(BaseModel):
     title: str = Field(min_length=3)
@@ -6,6 +8,49 @@ class TodoRequest(BaseModel):
     priority: int = Field(gt=0, lt=6)
     complete: bool
 
+class TodoResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    title: str
+    description: str
+    priority: int
+    complete: bool
+    owner_id: int
+
+class TodoPage(BaseModel):
+    todos: list[TodoResponse]
+    next_cursor: str | None
+
+class TodoSearchPage(BaseModel):
+    todos: list[TodoResponse]
+    next_offset: int | None
+
+class TodoBatchOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: int | None = Field(default=None, gt=0)
+    todo: TodoRequest | None = None
+
+    @model_validator(mode="after")
+    def check_fields_for_op(self):
+        if self.op == "create" and (self.id is not None or self.todo is None):
+            raise ValueError("create takes a todo and no id")
+        if self.op == "update" and (self.id is None or self.todo is None):
+            raise ValueError("update takes an id and a todo")
+        if self.op == "delete" and (self.id is None or self.todo is not None):
+            raise ValueError("delete takes an id and no todo")
+        return self
+
+class TodoBatchRequest(BaseModel):
+    operations: list[TodoBatchOperation] = Field(min_length=1, max_length=1000)
+
+    @model_validator(mode="after")
+    def check_unique_ids(self):
+        ids = [operation.id for operation in self.operations if operation.id is not None]
+        if len(ids) != len(set(ids)):
+            raise ValueError("each todo id may appear only once per batch")
+        return self
+
 class CreateUserRequest(BaseModel):
     username: str
     email: str
@@ -15,10 +60,35 @@ class CreateUserRequest(BaseModel):
     role: str
     phone_number: str | None = None
 
+class UserResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    email: str
+    username: str
+    first_name: str
+    last_name: str
+    is_active: bool
+    role: str
+    phone_number: str | None = None
+
 class UserVerifcation(BaseModel):
     password: str
     new_password: str = Field(min_length=6)
 
 class Token(BaseModel):
     access_token: str
-    token_type: str
\ No newline at end of file
+    token_type: str
+
+# Compiled validators/serializers for the hot list endpoints
+todo_list_adapter = TypeAdapter(list[TodoResponse])
+todo_page_adapter = TypeAdapter(TodoPage)
+todo_search_page_adapter = TypeAdapter(TodoSearchPage)
+
+def json_bytes_response(adapter: TypeAdapter, value: Any, headers=None) -> Response:
+    """Validate ORM objects from attributes and serialize straight to JSON bytes.
+
+    Skips FastAPI's generic jsonable_encoder pass over the ORM instances.
+    """
+    data = adapter.validate_python(value, from_attributes=True)
+    return Response(content=adapter.dump_json(data), media_type="application/json", headers=headers)
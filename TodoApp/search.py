@@ -0,0 +1,83 @@
+import logging
+import re
+from sqlalchemy import column, func, literal_column, select, table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from TodoApp.database import SCHEMA_HOOKS
+from TodoApp.models import Todos
+
+logger = logging.getLogger(__name__)
+
+# SQLite: an external-content FTS5 table over todos, kept in step by triggers
+SQLITE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS todos_fts
+       USING fts5(title, description, content='todos', content_rowid='id')""",
+    """CREATE TRIGGER IF NOT EXISTS todos_fts_insert AFTER INSERT ON todos BEGIN
+           INSERT INTO todos_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS todos_fts_delete AFTER DELETE ON todos BEGIN
+           INSERT INTO todos_fts(todos_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS todos_fts_update AFTER UPDATE OF title, description ON todos BEGIN
+           INSERT INTO todos_fts(todos_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+           INSERT INTO todos_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+       END""",
+]
+
+todos_fts = table("todos_fts", column("rowid"))
+
+def ensure_search_index(connection: Connection):
+    """Create the SQLite full-text index if this database doesn't have it yet.
+
+    Covers SQLite databases built by create_all. On Postgres the ALTER TABLE
+    rewrites todos under an exclusive lock, so the generated tsvector column and
+    its GIN index are left to the b81d4e0c6f3a migration (which builds the index
+    concurrently); startup only warns when they are missing.
+    """
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        if connection.execute(text("SELECT 1 FROM pg_indexes WHERE indexname = 'ix_todos_search_vector'")).first() is None:
+            logger.warning("todos has no full-text index; run `alembic upgrade head` before using /todos/search")
+    elif dialect == "sqlite":
+        if connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'todos_fts'")).first() is None:
+            for statement in SQLITE_SEARCH_DDL:
+                connection.execute(text(statement))
+            # Index the rows that existed before the triggers did
+            connection.execute(text("INSERT INTO todos_fts(todos_fts) VALUES ('rebuild')"))
+
+SCHEMA_HOOKS.append(ensure_search_index)
+
+
+def fts5_query(q: str) -> str:
+    """Free text to an FTS5 query: every word must match, the last one as a prefix.
+
+    Quoting each word means user input can never be parsed as FTS5 syntax.
+    """
+    words = re.findall(r"\w+", q)
+    if not words:
+        return ""
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+async def search_todos(db: AsyncSession, owner_id: int, q: str, limit: int, offset: int = 0):
+    """One page of the user's todos matching `q`, best match first, plus the next page's offset."""
+    dialect = db.bind.dialect.name # type: ignore
+    if dialect == "postgresql":
+        tsquery = func.websearch_to_tsquery(literal_column("'english'::regconfig"), q)
+        search_vector = literal_column("todos.search_vector")
+        rank = func.ts_rank_cd(search_vector, tsquery)
+        query = select(Todos).where(Todos.owner_id == owner_id, search_vector.op("@@")(tsquery))
+    else:
+        match = fts5_query(q)
+        if not match:
+            return [], None
+        # bm25 is lower-is-better; title matches count ten times description matches
+        rank = -func.bm25(literal_column("todos_fts"), 10.0, 1.0)
+        query = (
+            select(Todos)
+            .join(todos_fts, todos_fts.c.rowid == Todos.id)
+            .where(Todos.owner_id == owner_id, literal_column("todos_fts").op("MATCH")(match))
+        )
+    # One extra row tells us whether there is a next page
+    rows = (await db.scalars(query.order_by(rank.desc(), Todos.id).limit(limit + 1).offset(offset))).all()
+    next_offset = offset + limit if len(rows) > limit else None
+    return rows[:limit], next_offset
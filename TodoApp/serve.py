@@ -0,0 +1,109 @@
+"""Production entry point: a gunicorn master forking uvicorn workers.
+
+    python -m TodoApp.serve [--bind 0.0.0.0:8000] [--workers 4]
+
+The master imports the app once (preload) and forks the workers from it, so
+workers start without re-importing anything. Importing the app does no I/O.
+The master creates any missing tables once, before starting the workers;
+each worker then runs the lifespan (connection pool warm-up, template
+compilation, bcrypt backend load) before it accepts a connection.
+
+Reloading without dropping in-flight requests:
+
+    kill -HUP <master>     new workers start, old ones finish their requests and exit
+    kill -USR2 <master>    for new code: starts a new master next to the old one,
+    kill -QUIT <old>       then stop the old master once the new workers are up
+
+Where gunicorn is unavailable (Windows), falls back to uvicorn's own process
+manager, which spawns workers without preloading.
+"""
+import argparse
+import os
+import sys
+
+# Workers per host; one async worker per core keeps every core busy
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+BIND = os.getenv("BIND", "0.0.0.0:8000")
+# Seconds a stopping worker gets to finish in-flight requests
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+KEEPALIVE = int(os.getenv("KEEPALIVE", 5))
+
+
+def post_fork(server, worker):
+    # Workers must never share a pooled connection with the master
+    from TodoApp.database import reset_after_fork
+    reset_after_fork()
+
+
+def prepare_database():
+    """Create the schema once, here, instead of in every worker as they start together.
+
+    Concurrent CREATE TABLE/TYPE statements from several workers race on an
+    empty Postgres database, and the worker that loses fails its startup.
+    """
+    from TodoApp import database
+    # Registers the models and the schema hooks; importing the app does no I/O
+    import TodoApp.main # noqa: F401
+    if not database.DB_CREATE_SCHEMA:
+        return
+    database.create_schema()
+    # Forked (preloaded) workers see the module flag, spawned ones the environment
+    database.DB_CREATE_SCHEMA = False
+    os.environ["DB_CREATE_SCHEMA"] = "false"
+
+
+def gunicorn_options(bind: str, workers: int) -> dict:
+    return {
+        "bind": bind,
+        "workers": workers,
+        "worker_class": "uvicorn_worker.UvicornWorker",
+        "preload_app": True,
+        "graceful_timeout": GRACEFUL_TIMEOUT,
+        "keepalive": KEEPALIVE,
+        "post_fork": post_fork,
+        "accesslog": "-",
+    }
+
+
+def run_gunicorn(options: dict):
+    from gunicorn.app.base import BaseApplication
+
+    class TodoApplication(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value) # type: ignore
+
+        def load(self):
+            from TodoApp.main import app
+            return app
+
+    TodoApplication().run()
+
+
+def run_uvicorn(bind: str, workers: int):
+    import uvicorn
+    host, _, port = bind.rpartition(":")
+    uvicorn.run("TodoApp.main:app", host=host or "0.0.0.0", port=int(port), workers=workers,
+                timeout_graceful_shutdown=GRACEFUL_TIMEOUT, timeout_keep_alive=KEEPALIVE)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Todo app with multiple worker processes.")
+    parser.add_argument("--bind", default=BIND, help=f"host:port to listen on (default {BIND})")
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY,
+                        help=f"worker processes (default WEB_CONCURRENCY or the CPU count, {WEB_CONCURRENCY})")
+    args = parser.parse_args(argv)
+    prepare_database()
+
+    try:
+        import gunicorn # noqa: F401
+        import uvicorn_worker # noqa: F401
+    except ImportError:
+        print("gunicorn is not available; serving with uvicorn workers (no preload).", file=sys.stderr)
+        run_uvicorn(args.bind, args.workers)
+        return
+    run_gunicorn(gunicorn_options(args.bind, args.workers))
+
+
+if __name__ == "__main__":
+    main()
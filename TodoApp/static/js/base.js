@@ -28,7 +28,7 @@
                 if (response.ok) {
                     form.reset(); // Clear the form
                     alert('Todo created successfully!');
-                    window.location.href = '/todos/todo-page'; // Redirect to todo page
+                    returnToTodoList();
                 } else {
                     // Handle error
                     const errorData = await response.json();
@@ -79,7 +79,7 @@
             });
 
             if (response.ok) {
-                window.location.href = '/todos/todo-page'; // Redirect to the todo page
+                returnToTodoList();
             } else {
                 // Handle error
                 const errorData = await response.json();
@@ -110,7 +110,7 @@
 
                 if (response.ok) {
                     // Handle success
-                    window.location.href = '/todos/todo-page'; // Redirect to the todo page
+                    returnToTodoList();
                 } else {
                     // Handle error
                     const errorData = await response.json();
@@ -125,6 +125,68 @@
         
     }
 
+    // Todo list live updates: rows are patched from the server's change events
+    const todoRows = document.getElementById('todoRows');
+    if (todoRows) {
+        let todoEvents = null;
+
+        function applyTodoChange(change) {
+            let row = todoRows.querySelector(`tr[data-todo-id="${change.id}"]`);
+            if (change.op === 'delete') {
+                if (row) row.remove();
+                return;
+            }
+            if (!row) {
+                // Rows are in id order, so new todos only belong on the last page
+                if (todoRows.dataset.lastPage !== 'true') return;
+                row = document.createElement('tr');
+                row.dataset.todoId = change.id;
+                todoRows.appendChild(row);
+            }
+            row.className = change.complete ? 'pointer alert alert-success' : 'pointer';
+            row.innerHTML = `<td></td>${change.html}`;
+        }
+
+        function renumberTodoRows() {
+            todoRows.querySelectorAll('tr').forEach((row, index) => {
+                row.cells[0].textContent = index + 1;
+            });
+        }
+
+        function openTodoEvents() {
+            const source = new EventSource(`/todos/events?version=${todoRows.dataset.version}`);
+            source.addEventListener('changes', function (event) {
+                const data = JSON.parse(event.data);
+                data.changes.forEach(applyTodoChange);
+                renumberTodoRows();
+                todoRows.dataset.version = data.version;
+            });
+            // Some changes never reached this page. Re-render, but at most once a
+            // minute, so a lagging replica can't turn into a reload loop.
+            source.addEventListener('stale', function (event) {
+                todoRows.dataset.version = JSON.parse(event.data).version;
+                const lastReload = Number(sessionStorage.getItem('todoStaleReloadAt') || 0);
+                if (Date.now() - lastReload > 60000) {
+                    sessionStorage.setItem('todoStaleReloadAt', String(Date.now()));
+                    source.close();
+                    window.location.reload();
+                }
+            });
+            return source;
+        }
+
+        todoEvents = openTodoEvents();
+        // Close the stream while the page sits in the back-forward cache, catch up when it returns
+        window.addEventListener('pagehide', function () {
+            todoEvents.close();
+        });
+        window.addEventListener('pageshow', function (event) {
+            if (event.persisted) {
+                todoEvents = openTodoEvents();
+            }
+        });
+    }
+
     // Login JS
     const loginForm = document.getElementById('loginForm');
     if (loginForm) {
@@ -236,6 +298,16 @@
         return cookieValue;
     };
 
+    // Go back to the todo list; a cached list page catches up from its event stream instead of re-rendering
+    function returnToTodoList() {
+        const referrer = document.referrer ? new URL(document.referrer) : null;
+        if (referrer && referrer.origin === window.location.origin && referrer.pathname === '/todos/todo-page') {
+            window.history.back();
+        } else {
+            window.location.href = '/todos/todo-page';
+        }
+    };
+
     function logout() {
         // Get all cookies
         const cookies = document.cookie.split(";");
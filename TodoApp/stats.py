@@ -0,0 +1,59 @@
+import os
+from sqlalchemy import case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from TodoApp.models import Todos, TodoCounters
+from TodoApp.etags import UPSERT_INSERTS
+
+# When enabled, todo writes maintain a per-user row in todo_counters and
+# /todos/stats reads it instead of aggregating the todos table.
+TODO_COUNTERS_ENABLED = os.getenv("TODO_STATS_COUNTERS", "false").lower() == "true"
+
+def counters_enabled() -> bool:
+    return TODO_COUNTERS_ENABLED
+
+async def count_todos(db: AsyncSession, owner_id: int) -> tuple[int, int]:
+    """Return (total, completed) for a user with a single aggregate query."""
+    result = await db.execute(
+        select(
+            func.count(Todos.id),
+            func.coalesce(func.sum(case((Todos.complete, 1), else_=0)), 0)
+        ).where(Todos.owner_id == owner_id)
+    )
+    total, completed = result.one()
+    return int(total), int(completed)
+
+async def adjust_todo_counters(db: AsyncSession, owner_id: int, total: int = 0, completed: int = 0):
+    """Apply a delta to the user's counters inside the caller's transaction.
+
+    Call after the todo change has been added to the session and before commit.
+    If the user has no counters row yet it is seeded from the todos table.
+    """
+    if not TODO_COUNTERS_ENABLED or (total == 0 and completed == 0):
+        return
+    result = await db.execute(
+        update(TodoCounters)
+        .where(TodoCounters.owner_id == owner_id)
+        .values(total=TodoCounters.total + total, completed=TodoCounters.completed + completed)
+    )
+    if result.rowcount == 0: # type: ignore
+        # Seed from the table; flush first so the pending change is counted.
+        # A concurrent first write may seed the row first, so only the delta goes on top of it.
+        await db.flush()
+        seeded_total, seeded_completed = await count_todos(db, owner_id)
+        insert = UPSERT_INSERTS[db.bind.dialect.name] # type: ignore
+        stmt = insert(TodoCounters).values(owner_id=owner_id, total=seeded_total, completed=seeded_completed)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[TodoCounters.owner_id],
+            set_={"total": TodoCounters.total + total, "completed": TodoCounters.completed + completed}
+        ))
+
+async def read_todo_stats(db: AsyncSession, owner_id: int) -> tuple[int, int]:
+    """Return (total, completed) from the counters table when enabled, otherwise aggregate."""
+    if not TODO_COUNTERS_ENABLED:
+        return await count_todos(db, owner_id)
+
+    counters = await db.get(TodoCounters, owner_id)
+    if counters is None:
+        # Read-only (this may be a replica); the user's next write seeds the row
+        return await count_todos(db, owner_id)
+    return counters.total, counters.completed
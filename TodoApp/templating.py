@@ -0,0 +1,87 @@
+import os
+import time
+from collections import OrderedDict
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from markupsafe import Markup
+from TodoApp.assets import asset_url
+from TodoApp.metrics import template_render_time
+
+TEMPLATE_DIRECTORY = "TodoApp/templates"
+# Compiled template bytecode survives restarts here (default: a per-user temp dir)
+TEMPLATE_BYTECODE_CACHE_DIR = os.getenv("TEMPLATE_BYTECODE_CACHE_DIR")
+# Re-check template files for changes on every render; handy while editing templates
+TEMPLATE_AUTO_RELOAD = os.getenv("TEMPLATE_AUTO_RELOAD", "false").lower() == "true"
+# Rendered todo rows kept in memory per worker
+FRAGMENT_CACHE_SIZE = int(os.getenv("FRAGMENT_CACHE_SIZE", 5000))
+
+if TEMPLATE_BYTECODE_CACHE_DIR:
+    os.makedirs(TEMPLATE_BYTECODE_CACHE_DIR, exist_ok=True)
+
+env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIRECTORY),
+    bytecode_cache=FileSystemBytecodeCache(TEMPLATE_BYTECODE_CACHE_DIR),
+    auto_reload=TEMPLATE_AUTO_RELOAD,
+    # Keep every compiled template in memory
+    cache_size=-1,
+    autoescape=True,
+)
+
+class TimedJinja2Templates(Jinja2Templates):
+    """Jinja2Templates that records how long each page takes to render."""
+
+    def TemplateResponse(self, *args, **kwargs):
+        started = time.perf_counter()
+        response = super().TemplateResponse(*args, **kwargs)
+        template_render_time.observe(time.perf_counter() - started, template=response.template.name)
+        return response
+
+# One template environment shared by every router
+templates = TimedJinja2Templates(env=env)
+
+
+class FragmentCache:
+    """Small LRU of rendered template fragments."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[tuple, Markup] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key: tuple, render) -> Markup:
+        fragment = self._entries.get(key)
+        if fragment is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return fragment
+        self.misses += 1
+        fragment = Markup(render())
+        if self.max_size > 0:
+            self._entries[key] = fragment
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return fragment
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+fragment_cache = FragmentCache(FRAGMENT_CACHE_SIZE)
+
+def render_todo_row(todo, version: int) -> Markup:
+    """Row cells for one todo, cached by todo id and the owner's data version."""
+    return fragment_cache.get_or_render(
+        ("todo-row", todo.id, version),
+        lambda: env.get_template("todo-row.html").render(todo=todo)
+    )
+
+env.globals["todo_row"] = render_todo_row
+env.globals["asset_url"] = asset_url
+
+def precompile_templates():
+    """Load every template so the first request doesn't pay for compilation."""
+    for name in env.list_templates(extensions=["html"]):
+        env.get_template(name)
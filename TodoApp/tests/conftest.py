@@ -1,8 +1,11 @@
 from sqlalchemy import create_engine, text
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import StaticPool, NullPool
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from fastapi.testclient import TestClient
 from TodoApp.database import Base
+from TodoApp import database
+import asyncio
 from TodoApp.main import app
 from TodoApp.models import Todos, Users
 import pytest
@@ -10,6 +13,9 @@ from TodoApp.routers.auth import bcrypt_context
 from jose import jwt
 from datetime import timedelta, datetime, timezone
 import os
+from contextlib import contextmanager
+from TodoApp.query_log import QueryRecorder
+from TodoApp.search import ensure_search_index
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./testdb.db"
 
@@ -22,13 +28,18 @@ engine = create_engine(
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base.metadata.create_all(bind=engine)
+with engine.begin() as connection:
+    ensure_search_index(connection)
 
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
+# The routers use AsyncSession; point them at the same file through aiosqlite.
+# NullPool because TestClient may run each request on a different event loop.
+async_engine = create_async_engine("sqlite+aiosqlite:///./testdb.db", poolclass=NullPool)
+
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def override_get_db():
+    async with TestingAsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 def override_get_current_user():
     return {"username": "codingwithrobytest", "user_id": 1, "user_role": "admin"}
@@ -153,4 +164,35 @@ def test_todo_new(test_user_new):
         db.refresh(test_todo)
         return test_todo
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+@pytest.fixture
+def query_budget():
+    """Fail the test if the block runs more statements than budgeted.
+
+        with query_budget(2):
+            client.get("/todos/")
+    """
+    @contextmanager
+    def budget(max_queries: int):
+        with QueryRecorder() as recorder:
+            yield recorder
+        assert recorder.count <= max_queries, (
+            f"{recorder.count} queries, budget {max_queries}:\n" + "\n".join(recorder.statements)
+        )
+    return budget
+
+@pytest.fixture
+def app_database(monkeypatch):
+    """Point the app's own engines (the lifespan, warm-up, /internal) at the test database."""
+    engine_getters = [database.get_engine, database.get_session_local, database.get_async_engine,
+                      database.get_async_session_local, database.get_replica_async_engine,
+                      database.get_replica_session_local]
+    monkeypatch.setattr(database, "database_url", lambda: SQLALCHEMY_DATABASE_URL)
+    monkeypatch.delenv("SQLALCHEMY_DATABASE_URL_REPLICA", raising=False)
+    for getter in engine_getters:
+        getter.cache_clear()
+    yield
+    asyncio.run(database.dispose_engines())
+    for getter in engine_getters:
+        getter.cache_clear()
@@ -1,9 +1,11 @@
-from TodoApp.routers.admin import get_db, get_current_user
+from TodoApp.routers.admin import get_db, get_read_db, get_current_user
 from TodoApp.tests import conftest
 from TodoApp.models import Todos
 from fastapi import status
+import json
 
 conftest.app.dependency_overrides[get_db] = conftest.override_get_db
+conftest.app.dependency_overrides[get_read_db] = conftest.override_get_db
 conftest.app.dependency_overrides[get_current_user] = conftest.override_get_current_user
 
 def test_admin_read_all_authenticated(test_todo):
@@ -11,6 +13,19 @@ def test_admin_read_all_authenticated(test_todo):
     assert response.status_code == status.HTTP_200_OK
     # assert response.json() == [{"complete": False, "title": "Learn to code", "description": "Need to learn everyday", "priority": 5, "owner_id": 1}]
 
+def test_admin_read_all_ndjson(test_todo):
+    response = conftest.client.get("/admin/todo?format=ndjson")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows == [{"id": 1, "title": "Learn to code", "description": "Need to learn everyday",
+                     "priority": 5, "complete": False, "owner_id": 1}]
+
+def test_admin_read_all_invalid_format():
+    response = conftest.client.get("/admin/todo?format=xml")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
 def test_admin_delete_todo(test_todo):
     response = conftest.client.delete("/admin/todo/1")
     assert response.status_code == 204
@@ -1,24 +1,33 @@
 from TodoApp.tests import conftest
 from TodoApp.routers.auth import get_db, authenticate_user, create_access_token, secret_key, algorithm, get_current_user
 from jose import jwt
-from datetime import timedelta
+from datetime import timedelta, datetime, timezone
 import pytest
+import time
+import asyncio
 from fastapi import HTTPException
+from TodoApp.hashing import PasswordHasher, bcrypt_context
+from TodoApp.token_cache import TokenCache, token_cache
+from TodoApp.hashing import password_hasher
+from TodoApp.rate_limit import DatabaseBackend, MemoryBackend, RateLimit, rate_limiter
+from TodoApp.routers import auth
+from TodoApp.models import RateLimitBuckets
+from sqlalchemy import select
 
 conftest.app.dependency_overrides[get_db] = conftest.override_get_db
 
-def test_authenticate_user(test_user):
-    db = conftest.TestingSessionLocal()
-
-    authenticated_user = authenticate_user(test_user.username, "testpassword", db)
-    assert authenticated_user is not False and authenticated_user is not None
-    assert authenticated_user.username == test_user.username
+@pytest.mark.asyncio
+async def test_authenticate_user(test_user):
+    async with conftest.TestingAsyncSessionLocal() as db:
+        authenticated_user = await authenticate_user(test_user.username, "testpassword", db)
+        assert authenticated_user is not False and authenticated_user is not None
+        assert authenticated_user.username == test_user.username
 
-    non_existent_user = authenticate_user("Wrongusername", "testpassword", db)
-    assert non_existent_user is False
+        non_existent_user = await authenticate_user("Wrongusername", "testpassword", db)
+        assert non_existent_user is False
 
-    wrong_password_user = authenticate_user(test_user.username, "wrongpassword", db)
-    assert wrong_password_user is False
+        wrong_password_user = await authenticate_user(test_user.username, "wrongpassword", db)
+        assert wrong_password_user is False
 
 def test_create_access_token():
     username = "testuser"
@@ -53,3 +62,125 @@ async def test_get_current_user_missing_payload():
     assert excinfo.value.status_code == 401
     assert excinfo.value.detail == "Could not validate user."
 
+
+@pytest.mark.asyncio
+async def test_password_hasher_round_trip():
+    hasher = PasswordHasher(bcrypt_context, max_workers=1, max_pending=2)
+
+    hashed = await hasher.hash("testpassword")
+    assert await hasher.verify("testpassword", hashed) is True
+    assert await hasher.verify("wrongpassword", hashed) is False
+    assert hasher.stats()["completed"] == 3
+
+@pytest.mark.asyncio
+async def test_password_hasher_rejects_when_full():
+    hasher = PasswordHasher(bcrypt_context, max_workers=1, max_pending=0)
+
+    with pytest.raises(HTTPException) as excinfo:
+        await hasher.hash("testpassword")
+
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.headers == {"Retry-After": "1"}
+    assert hasher.stats()["rejected"] == 1
+
+@pytest.mark.asyncio
+async def test_get_current_user_caches_verified_token():
+    token_cache.clear()
+    token = create_access_token("testuser", 1, "admin", timedelta(minutes=5))
+
+    first = await get_current_user(token)
+    second = await get_current_user(token)
+
+    assert first == second == {"username": "testuser", "user_id": 1, "user_role": "admin"}
+    assert token_cache.stats()["hits"] == 1
+    assert token_cache.stats()["misses"] == 1
+
+def test_token_cache_expires_and_evicts():
+    cache = TokenCache(max_size=2)
+    now = datetime.now(timezone.utc).timestamp()
+
+    cache.put("expired", {"user_id": 1}, now - 1)
+    assert cache.get("expired") is None
+
+    cache.put("a", {"user_id": 1}, now + 60)
+    cache.put("b", {"user_id": 2}, now + 60)
+    cache.get("a")
+    cache.put("c", {"user_id": 3}, now + 60)
+    # "b" was least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == {"user_id": 1}
+    assert cache.stats()["size"] == 2
+
+def test_login_throttled_before_hashing(test_user, monkeypatch):
+    rate_limiter.clear()
+    monkeypatch.setattr(auth, "LOGIN_LIMIT_PER_USERNAME", RateLimit(2, 60))
+    credentials = {"username": test_user.username, "password": "wrongpassword"}
+
+    for _ in range(2):
+        assert conftest.client.post("/auth/token", data=credentials).status_code == 401
+    hashed = password_hasher.stats()["completed"]
+
+    response = conftest.client.post("/auth/token", data={**credentials, "username": test_user.username.upper()})
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+    # The rejected attempt never reached bcrypt
+    assert password_hasher.stats()["completed"] == hashed
+    assert rate_limiter.stats()["rejected"] == 1
+
+def test_register_throttled_per_ip(monkeypatch):
+    rate_limiter.clear()
+    limit = RateLimit(1, 60)
+    monkeypatch.setattr(auth, "REGISTER_LIMIT_PER_IP", limit)
+    # Spend the TestClient address's only token
+    asyncio.run(rate_limiter.enforce(("register:ip:testclient", limit)))
+
+    response = conftest.client.post("/auth/", json={
+        "username": "throttled", "email": "throttled@example.com", "first_name": "T", "last_name": "U",
+        "password": "secret", "role": "user"
+    })
+    assert response.status_code == 429
+    assert "retry-after" in response.headers
+
+def test_register_throttled_per_username(monkeypatch):
+    rate_limiter.clear()
+    limit = RateLimit(1, 60)
+    monkeypatch.setattr(auth, "REGISTER_LIMIT_PER_USERNAME", limit)
+    # Another address already tried this name
+    asyncio.run(rate_limiter.enforce(("register:user:throttled", limit)))
+
+    response = conftest.client.post("/auth/", json={
+        "username": "Throttled", "email": "throttled@example.com", "first_name": "T", "last_name": "U",
+        "password": "secret", "role": "user"
+    })
+    assert response.status_code == 429
+    assert "retry-after" in response.headers
+    rate_limiter.clear()
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", [MemoryBackend(100), DatabaseBackend(conftest.async_engine)], ids=["memory", "database"])
+async def test_rate_limit_backends_refill(backend):
+    limit = RateLimit(2, 10)
+    key = f"test:{time.time()}"
+    assert await backend.hit(key, limit, 1000.0) == 0
+    assert await backend.hit(key, limit, 1000.0) == 0
+    # Empty: one token comes back every 5 seconds
+    assert await backend.hit(key, limit, 1001.0) == pytest.approx(4.0)
+    assert await backend.hit(key, limit, 1005.0) == 0
+    assert await backend.hit(key, limit, 1005.0) > 0
+
+@pytest.mark.asyncio
+async def test_database_backend_prunes_refilled_buckets():
+    backend = DatabaseBackend(conftest.async_engine, prune_interval=60)
+    limit = RateLimit(2, 10)
+    stale, fresh = f"test:stale:{time.time()}", f"test:fresh:{time.time()}"
+    await backend.hit(stale, limit, 1000.0)
+    await backend.hit(fresh, limit, 1055.0)
+    # Not due yet: the stale bucket is still there
+    async with conftest.async_engine.connect() as connection:
+        keys = set((await connection.execute(select(RateLimitBuckets.key))).scalars())
+    assert {stale, fresh} <= keys
+
+    await backend.hit(fresh, limit, 1060.0)
+    async with conftest.async_engine.connect() as connection:
+        keys = set((await connection.execute(select(RateLimitBuckets.key))).scalars())
+    assert stale not in keys and fresh in keys
@@ -0,0 +1,71 @@
+import asyncio
+from datetime import timedelta
+from fastapi import status
+from fastapi.testclient import TestClient
+from TodoApp.tests import conftest
+from TodoApp.routers import auth
+from TodoApp.routers.internal import get_current_user
+from TodoApp.routers.todos import get_db, get_read_db
+from TodoApp.events import todo_events
+from TodoApp.rate_limit import RateLimit, rate_limiter
+
+conftest.app.dependency_overrides[get_db] = conftest.override_get_db
+conftest.app.dependency_overrides[get_current_user] = conftest.override_get_current_user
+
+def test_read_pool_stats(app_database, monkeypatch):
+    with TestClient(conftest.app) as lifespan_client:
+        pool = lifespan_client.get("/internal/pool").json()
+        assert pool["size"] == 5
+        # The lifespan's warm-up left its connections in the pool
+        assert pool["checked_out"] == 0 and pool["checked_in"] >= 1
+        assert pool["checkouts"] >= pool["checked_in"]
+
+        # A request on the app's own engine checks a connection out and back in
+        monkeypatch.delitem(conftest.app.dependency_overrides, get_read_db, raising=False)
+        assert lifespan_client.get("/todos/").status_code == status.HTTP_200_OK
+        after = lifespan_client.get("/internal/pool").json()
+        assert after["checkouts"] > pool["checkouts"]
+        assert after["checked_out"] == 0
+
+def test_read_hasher_stats(test_user):
+    rate_limiter.clear()
+    before = conftest.client.get("/internal/hasher").json()
+    response = conftest.client.post("/auth/token", data={"username": test_user.username, "password": "testpassword"})
+    assert response.status_code == status.HTTP_200_OK
+
+    after = conftest.client.get("/internal/hasher").json()
+    assert after["completed"] == before["completed"] + 1
+    assert after["in_flight"] == 0 and after["queued"] == 0
+
+def test_read_token_cache_stats():
+    token = auth.create_access_token("cacheduser", 7, "user", timedelta(minutes=5))
+    before = conftest.client.get("/internal/token-cache").json()
+    for _ in range(2):
+        asyncio.run(auth.get_current_user(token))
+
+    after = conftest.client.get("/internal/token-cache").json()
+    assert after["misses"] == before["misses"] + 1
+    assert after["hits"] == before["hits"] + 1
+    assert after["size"] >= 1
+
+def test_read_rate_limit_stats(test_user, monkeypatch):
+    rate_limiter.clear()
+    monkeypatch.setattr(auth, "LOGIN_LIMIT_PER_USERNAME", RateLimit(1, 60))
+    credentials = {"username": test_user.username, "password": "wrongpassword"}
+    assert conftest.client.post("/auth/token", data=credentials).status_code == status.HTTP_401_UNAUTHORIZED
+    assert conftest.client.post("/auth/token", data=credentials).status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+    stats = conftest.client.get("/internal/rate-limit").json()
+    assert stats == {"backend": "memory", "allowed": 1, "rejected": 1}
+    rate_limiter.clear()
+
+def test_read_event_hub_stats(test_todo):
+    before = conftest.client.get("/internal/events").json()
+    conftest.client.patch(f"/todos/todo/{test_todo.id}/toggle")
+    with todo_events.subscribe(1):
+        during = conftest.client.get("/internal/events").json()
+
+    assert during["published"] == before["published"] + 1
+    assert during["connections"] == before["connections"] + 1
+    assert during["users_with_history"] >= 1
+    assert conftest.client.get("/internal/events").json()["connections"] == before["connections"]
@@ -1,10 +1,170 @@
 from fastapi.testclient import TestClient
-from fastapi import status
+from fastapi import FastAPI, status
 from TodoApp.main import app
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from TodoApp.assets import AssetStaticFiles, build_assets
+from TodoApp.compression import CompressionMiddleware
+from TodoApp import database
+import os
+import subprocess
+import sys
+
+# Cold `import TodoApp.main` in a fresh interpreter, in seconds (about 1.2s locally)
+IMPORT_TIME_BUDGET = 3.0
 
 client = TestClient(app)
 
+
 def test_return_health_check():
     response = client.get("/healthy")
     assert response.status_code == status.HTTP_200_OK
-    assert response.json() == {"status": "Healthy"}
\ No newline at end of file
+    assert response.json() == {"status": "Healthy"}
+
+
+def test_build_and_serve_precompressed_assets(tmp_path):
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "site.css").write_text("body { color: #333; }\n" * 200)
+
+    manifest = build_assets(str(tmp_path))
+    hashed_path = manifest["css/site.css"]
+    assert hashed_path.startswith("css/site.") and hashed_path != "css/site.css"
+    assert (tmp_path / "dist" / (hashed_path + ".gz")).exists()
+
+    asset_app = FastAPI()
+    asset_app.mount("/static", AssetStaticFiles(directory=str(tmp_path)), name="static")
+    asset_client = TestClient(asset_app)
+
+    response = asset_client.get(f"/static/dist/{hashed_path}", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-type"].startswith("text/css")
+    assert "immutable" in response.headers["cache-control"]
+    assert response.text == "body { color: #333; }\n" * 200
+
+    response = asset_client.get(f"/static/dist/{hashed_path}", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert "immutable" in response.headers["cache-control"]
+
+
+def test_compression_middleware():
+    compressed_app = FastAPI()
+    compressed_app.add_middleware(CompressionMiddleware, minimum_size=500, compresslevel=6,
+                                  content_types=["application/json", "application/x-ndjson"])
+
+    @compressed_app.get("/large")
+    def large():
+        return [{"title": "Learn to code", "priority": 5}] * 100
+
+    @compressed_app.get("/small")
+    def small():
+        return {"status": "ok"}
+
+    @compressed_app.get("/text")
+    def text():
+        return PlainTextResponse("x" * 5000)
+
+    @compressed_app.get("/stream")
+    def stream():
+        return StreamingResponse((f'{{"id": {i}}}\n' for i in range(1000)), media_type="application/x-ndjson")
+
+    compressed_client = TestClient(compressed_app)
+    gzip_headers = {"Accept-Encoding": "gzip"}
+
+    response = compressed_client.get("/large", headers=gzip_headers)
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < 500
+    assert len(response.json()) == 100
+
+    assert "content-encoding" not in compressed_client.get("/small", headers=gzip_headers).headers
+    assert "content-encoding" not in compressed_client.get("/text", headers=gzip_headers).headers
+    assert "content-encoding" not in compressed_client.get("/large", headers={"Accept-Encoding": "identity"}).headers
+
+    response = compressed_client.get("/stream", headers=gzip_headers)
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text.splitlines()[-1] == '{"id": 999}'
+
+
+def test_metrics_endpoint():
+    client.get("/healthy")
+    response = client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/healthy",status="200"}' in body
+    assert 'http_request_db_queries_bucket{route="/healthy",le="+Inf"}' in body
+    for series in ("password_hash_seconds", "template_render_seconds", "db_pool_wait_seconds", "db_pool_checked_out"):
+        assert f"# TYPE {series}" in body
+
+
+def test_cold_import_within_budget_and_without_database():
+    env = {name: value for name, value in os.environ.items() if name != "SQLALCHEMY_DATABASE_URL_POSTGRES"}
+    code = ("import time; started = time.perf_counter(); import TodoApp.main; "
+            "elapsed = time.perf_counter() - started; from TodoApp import database; "
+            "print(elapsed, database.get_engine.cache_info().currsize, database.get_async_engine.cache_info().currsize)")
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(database.__file__)))
+    assert result.returncode == 0, result.stderr
+    elapsed, engines, async_engines = result.stdout.split()
+    # No engine (and so no connection) until the lifespan runs
+    assert (engines, async_engines) == ("0", "0")
+    assert float(elapsed) < IMPORT_TIME_BUDGET
+
+
+def test_suite_collects_without_database_url():
+    # Test modules must not build the app's engines at import, e.g. via `from TodoApp.database import SessionLocal`
+    env = {name: value for name, value in os.environ.items() if name != "SQLALCHEMY_DATABASE_URL_POSTGRES"}
+    root = os.path.dirname(os.path.dirname(database.__file__))
+    result = subprocess.run([sys.executable, "-m", "pytest", "--collect-only", "-q", os.path.join("TodoApp", "tests")],
+                            env=env, capture_output=True, text=True, cwd=root)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+def test_lifespan_initializes_and_disposes(app_database, monkeypatch):
+    monkeypatch.setattr(database, "DB_CREATE_SCHEMA", False)
+    with TestClient(app) as lifespan_client:
+        assert database.get_async_engine.cache_info().currsize == 1
+        assert database.get_async_engine().url.database == "./testdb.db"
+        # Warm-up opened connections and returned them to the pool
+        assert database.get_async_engine().sync_engine.pool.checkedin() >= 1
+        assert lifespan_client.get("/healthy").status_code == status.HTTP_200_OK
+    assert database.get_async_engine().sync_engine.pool.checkedin() == 0
+
+
+def test_serve_preloads_and_warms_each_worker(app_database):
+    from TodoApp.serve import gunicorn_options, post_fork
+    options = gunicorn_options("127.0.0.1:8000", 3)
+    assert options["workers"] == 3
+    assert options["preload_app"] is True
+    assert options["worker_class"] == "uvicorn_worker.UvicornWorker"
+    assert options["post_fork"] is post_fork
+    # Open todo event streams end on their own before a stopping worker is killed
+    from TodoApp.events import TODO_EVENTS_MAX_SECONDS
+    assert TODO_EVENTS_MAX_SECONDS < options["graceful_timeout"]
+
+    # Warm-up connections go back to the pool for the first requests to reuse
+    import asyncio
+    asyncio.run(database.warm_pool(2))
+    pool = database.get_async_engine().sync_engine.pool
+    assert pool.checkedin() == 2 and pool.checkedout() == 0
+    assert pool.stats.waits == 2
+
+
+def test_serve_creates_schema_once_before_workers(app_database, monkeypatch):
+    from sqlalchemy import inspect
+    from TodoApp.serve import prepare_database
+    monkeypatch.setattr(database, "DB_CREATE_SCHEMA", True)
+    monkeypatch.setenv("DB_CREATE_SCHEMA", "true")
+    prepare_database()
+    # The master keeps no connection for the workers to inherit
+    assert database.get_engine().pool.checkedin() == 0
+    assert inspect(database.get_engine()).has_table("todo_counters")
+
+    # Workers, forked or spawned, only warm up
+    assert database.DB_CREATE_SCHEMA is False
+    assert os.environ["DB_CREATE_SCHEMA"] == "false"
+    created = []
+    monkeypatch.setattr(database.Base.metadata, "create_all", lambda *args, **kwargs: created.append(args))
+    with TestClient(app) as lifespan_client:
+        assert lifespan_client.get("/healthy").status_code == status.HTTP_200_OK
+    assert created == []
@@ -1,10 +1,11 @@
 
-from TodoApp.routers.todos import get_current_user, get_db
+from TodoApp.routers.todos import get_current_user, get_db, get_read_db
 from fastapi import status
 from TodoApp.models import Todos
 from TodoApp.tests import conftest
 
 conftest.app.dependency_overrides[get_db] = conftest.override_get_db
+conftest.app.dependency_overrides[get_read_db] = conftest.override_get_db
 conftest.app.dependency_overrides[get_current_user] = conftest.override_get_current_user
 
 def test_read_all_authenticated(test_todo):
@@ -12,7 +13,8 @@ def test_read_all_authenticated(test_todo):
     assert response.status_code == status.HTTP_200_OK
     
     data = response.json()
-    todo = data[0]
+    assert data["next_cursor"] is None
+    todo = data["todos"][0]
     print(todo)
     assert todo["title"] == "Learn to code"
     assert todo["description"] == "Need to learn everyday"
@@ -1,13 +1,22 @@
 import pytest
 from fastapi.testclient import TestClient
 from TodoApp.main import app
-from TodoApp.database import SessionLocal
-from TodoApp.models import Users, Todos
-from TodoApp.routers.todos import get_current_user, get_db
+from TodoApp.models import Users, Todos, TodoCounters
+from TodoApp import stats
+from sqlalchemy import text
+from TodoApp.routers.auth import create_access_token
+from TodoApp.templating import fragment_cache
+from datetime import timedelta
+from TodoApp.routers.todos import get_current_user, get_db, get_read_db
 from TodoApp.tests import conftest
+from TodoApp import query_log
+import logging
+import time
+import json
 
 # Override dependencies to use test database
 conftest.app.dependency_overrides[get_db] = conftest.override_get_db
+conftest.app.dependency_overrides[get_read_db] = conftest.override_get_db
 conftest.app.dependency_overrides[get_current_user] = conftest.override_get_current_user
 
 client = TestClient(app)
@@ -95,3 +104,433 @@ def test_get_todo_stats_empty(test_user):
         # Reset to original override
         conftest.app.dependency_overrides[get_current_user] = conftest.override_get_current_user
 
+
+def test_read_all_paginated(test_todo):
+    """Test walking the todo list with limit/after keyset pagination"""
+    db = conftest.TestingSessionLocal()
+    try:
+        for i in range(4):
+            db.add(Todos(title=f"Todo {i}", description="Paged", priority=1, complete=False, owner_id=1))
+        db.commit()
+    finally:
+        db.close()
+
+    response = client.get("/todos/?limit=2")
+    assert response.status_code == 200
+    first_page = response.json()
+    assert [todo["id"] for todo in first_page["todos"]] == [1, 2]
+    assert first_page["next_cursor"] == "2"
+
+    response = client.get(f"/todos/?limit=2&after={first_page['next_cursor']}")
+    second_page = response.json()
+    assert [todo["id"] for todo in second_page["todos"]] == [3, 4]
+    assert second_page["next_cursor"] == "4"
+
+    response = client.get(f"/todos/?limit=2&after={second_page['next_cursor']}")
+    last_page = response.json()
+    assert [todo["id"] for todo in last_page["todos"]] == [5]
+    assert last_page["next_cursor"] is None
+
+def test_read_all_rejects_oversized_limit():
+    """Test that the page size is capped"""
+    response = client.get("/todos/?limit=100000")
+    assert response.status_code == 422
+
+def test_todo_stats_with_counters(test_todo, monkeypatch):
+    """Test that writes keep the per-user counters in step when they are enabled"""
+    monkeypatch.setattr(stats, "TODO_COUNTERS_ENABLED", True)
+    try:
+        # The fixture todo was inserted directly, so the first write seeds the counters
+        response = client.post("/todos/todo", json={"title": "Counted", "description": "Counted todo", "priority": 2, "complete": True})
+        assert response.status_code == 201
+        client.patch(f"/todos/todo/{test_todo.id}/toggle")
+        client.put(f"/todos/todo/{test_todo.id}", json={"title": "Learn to code", "description": "Need to learn everyday", "priority": 5, "complete": False})
+        client.delete("/todos/todo/2")
+
+        db = conftest.TestingSessionLocal()
+        counters = db.get(TodoCounters, 1)
+        assert counters is not None
+        assert (counters.total, counters.completed) == (1, 0)
+        db.close()
+
+        response = client.get("/todos/stats")
+        assert response.json() == {"total_todos": 1, "completed_todos": 0, "pending_todos": 1, "completion_rate": 0}
+    finally:
+        with conftest.engine.connect() as connection:
+            connection.execute(text("DELETE FROM todo_counters;"))
+            connection.commit()
+
+@pytest.mark.asyncio
+async def test_counters_seed_tolerates_concurrent_first_write(monkeypatch):
+    """Test that a first write finding the counters row already seeded adds its delta instead of failing"""
+    monkeypatch.setattr(stats, "TODO_COUNTERS_ENABLED", True)
+    count_todos = stats.count_todos
+
+    async def count_while_another_write_seeds(db, owner_id):
+        counted = await count_todos(db, owner_id)
+        # Another request's first write commits its seed between our UPDATE and INSERT
+        await db.execute(text("INSERT INTO todo_counters (owner_id, total, completed) VALUES (:owner_id, 4, 1)"),
+                         {"owner_id": owner_id})
+        return counted
+
+    monkeypatch.setattr(stats, "count_todos", count_while_another_write_seeds)
+    try:
+        async with conftest.TestingAsyncSessionLocal() as db:
+            await stats.adjust_todo_counters(db, 1, total=1, completed=1)
+            await db.commit()
+        with conftest.TestingSessionLocal() as db:
+            counters = db.get(TodoCounters, 1)
+            assert counters is not None and (counters.total, counters.completed) == (5, 2)
+    finally:
+        with conftest.engine.begin() as connection:
+            connection.execute(text("DELETE FROM todo_counters;"))
+
+def test_apply_todo_batch(test_todo):
+    """Test a mixed batch of creates, updates and deletes"""
+    request_data = {"operations": [
+        {"op": "create", "todo": {"title": "Batch one", "description": "First batch todo", "priority": 1, "complete": False}},
+        {"op": "create", "todo": {"title": "Batch two", "description": "Second batch todo", "priority": 2, "complete": True}},
+        {"op": "update", "id": test_todo.id, "todo": {"title": "Updated in batch", "description": "Need to learn everyday", "priority": 3, "complete": True}},
+        {"op": "delete", "id": 999},
+    ]}
+
+    response = client.post("/todos/batch", json=request_data)
+    assert response.status_code == 200
+    assert response.json() == {"results": [
+        {"op": "create", "id": 2, "status": 201},
+        {"op": "create", "id": 3, "status": 201},
+        {"op": "update", "id": test_todo.id, "status": 204},
+        {"op": "delete", "id": 999, "status": 404},
+    ]}
+
+    db = conftest.TestingSessionLocal()
+    try:
+        updated = db.query(Todos).filter(Todos.id == test_todo.id).first()
+        assert updated.title == "Updated in batch" and updated.complete is True
+        assert db.query(Todos).filter(Todos.owner_id == 1).count() == 3
+    finally:
+        db.close()
+
+    response = client.post("/todos/batch", json={"operations": [{"op": "delete", "id": 2}, {"op": "delete", "id": 3}]})
+    assert [result["status"] for result in response.json()["results"]] == [204, 204]
+
+def test_apply_todo_batch_rejects_duplicate_ids(test_todo):
+    """Test that a batch may not touch the same todo twice"""
+    response = client.post("/todos/batch", json={"operations": [{"op": "delete", "id": test_todo.id}, {"op": "delete", "id": test_todo.id}]})
+    assert response.status_code == 422
+
+def test_read_all_conditional_get(test_todo):
+    """Test that an unchanged list answers If-None-Match with 304 and a write invalidates it"""
+    response = client.get("/todos/")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = client.get("/todos/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    # Other pages of the same list have their own ETag
+    assert client.get("/todos/?limit=1").headers["etag"] != etag
+
+    client.patch(f"/todos/todo/{test_todo.id}/toggle")
+    response = client.get("/todos/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+    etag = response.headers["etag"]
+    assert client.get("/todos/stats", headers={"If-None-Match": etag}).status_code == 200
+    stats_etag = client.get("/todos/stats").headers["etag"]
+    assert client.get("/todos/stats", headers={"If-None-Match": stats_etag}).status_code == 304
+
+def test_render_todo_page_caches_rows(test_todo):
+    """Test that todo rows come from the fragment cache until the data version changes"""
+    fragment_cache.clear()
+    token = create_access_token("codingwithrobytest", 1, "admin", timedelta(minutes=5))
+    cookies = {"access_token": token}
+
+    page_client = TestClient(app, cookies=cookies)
+    response = page_client.get("/todos/todo-page")
+    assert response.status_code == 200
+    assert "Learn to code" in response.text
+    assert (fragment_cache.hits, fragment_cache.misses) == (0, 1)
+
+    page_client.get("/todos/todo-page")
+    assert (fragment_cache.hits, fragment_cache.misses) == (1, 1)
+
+    client.patch(f"/todos/todo/{test_todo.id}/toggle")
+    response = page_client.get("/todos/todo-page")
+    assert 'class="strike-through-td"' in response.text
+    assert fragment_cache.misses == 2
+
+def test_todo_endpoints_query_budgets(test_todo, query_budget):
+    """Test that the hot endpoints stay within their query budgets (no N+1 as data grows)"""
+    todo_id = test_todo.id
+    todo = {"title": "Budgeted todo", "description": "Stay within budget", "priority": 3, "complete": False}
+    client.post("/todos/batch", json={"operations": [{"op": "create", "todo": todo} for _ in range(20)]})
+
+    with query_budget(2):
+        assert client.get("/todos/").status_code == 200
+    with query_budget(2):
+        assert client.get(f"/todos/todo/{todo_id}").status_code == 200
+    with query_budget(2):
+        assert client.get("/todos/stats").status_code == 200
+    with query_budget(2):
+        assert client.post("/todos/todo", json=todo).status_code == 201
+    with query_budget(2):
+        assert client.patch(f"/todos/todo/{todo_id}/toggle").status_code == 200
+    with query_budget(1):
+        assert client.get("/admin/todo").status_code == 200
+
+def test_slow_query_log(test_todo, monkeypatch, caplog):
+    """Test that statements over the threshold are logged with route and parameter types only"""
+    monkeypatch.setattr(query_log, "SLOW_QUERY_THRESHOLD_MS", 1e-9)
+    with caplog.at_level(logging.WARNING, logger="TodoApp.slow_query"):
+        client.get(f"/todos/todo/{test_todo.id}")
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("route=/todos/todo/{todo_id}" in message and "SELECT" in message for message in messages)
+    assert all("Learn to code" not in message for message in messages)
+
+def test_search_todos_ranked_and_paginated(test_todo):
+    """Test full-text search: owner scoped, title matches first, paginated by offset"""
+    todos = [
+        {"title": "Groceries", "description": "Buy milk and bread", "priority": 2, "complete": False},
+        {"title": "Milk the budget", "description": "Review the spending", "priority": 3, "complete": False},
+        {"title": "Call mom", "description": "About the milkshake recipe", "priority": 1, "complete": False},
+    ]
+    client.post("/todos/batch", json={"operations": [{"op": "create", "todo": todo} for todo in todos]})
+    db = conftest.TestingSessionLocal()
+    db.add(Todos(title="Milk run", description="Someone else's todo", priority=1, complete=False, owner_id=999))
+    db.commit()
+    db.close()
+
+    response = client.get("/todos/search", params={"q": "milk"})
+    assert response.status_code == 200
+    titles = [todo["title"] for todo in response.json()["todos"]]
+    # Prefix match on the last word, title hits rank above description hits
+    assert titles[0] == "Milk the budget"
+    assert set(titles) == {"Milk the budget", "Groceries", "Call mom"}
+
+    page = client.get("/todos/search", params={"q": "milk", "limit": 2}).json()
+    assert len(page["todos"]) == 2 and page["next_offset"] == 2
+    rest = client.get("/todos/search", params={"q": "milk", "limit": 2, "offset": 2}).json()
+    assert len(rest["todos"]) == 1 and rest["next_offset"] is None
+
+    # Edits are reindexed; FTS syntax in the query is treated as plain words
+    client.put(f"/todos/todo/{test_todo.id}", json={"title": "Learn Rust", "description": "Milk every tutorial",
+                                                    "priority": 5, "complete": False})
+    assert len(client.get("/todos/search", params={"q": "milk"}).json()["todos"]) == 4
+    assert client.get("/todos/search", params={"q": '"rust*'}).json()["todos"][0]["title"] == "Learn Rust"
+    assert client.get("/todos/search", params={"q": "!!!"}).json() == {"todos": [], "next_offset": None}
+
+def test_read_all_filter_and_sort(test_todo):
+    """Test complete/priority filters and priority sorting with keyset pages"""
+    todos = [
+        {"title": f"Todo {n}", "description": "Filter me", "priority": priority, "complete": complete}
+        for n, (priority, complete) in enumerate([(1, False), (3, True), (3, False), (5, True), (2, False)])
+    ]
+    client.post("/todos/batch", json={"operations": [{"op": "create", "todo": todo} for todo in todos]})
+
+    pending = client.get("/todos/", params={"complete": False}).json()["todos"]
+    assert all(not todo["complete"] for todo in pending) and len(pending) == 4
+
+    assert [todo["priority"] for todo in client.get("/todos/", params={"priority": 3}).json()["todos"]] == [3, 3]
+
+    # Descending priority, walked two at a time through the cursor
+    seen = []
+    params = {"sort": "-priority", "limit": 2}
+    while True:
+        page = client.get("/todos/", params=params).json()
+        seen += [(todo["priority"], todo["id"]) for todo in page["todos"]]
+        if page["next_cursor"] is None:
+            break
+        params["after"] = page["next_cursor"]
+    assert seen == sorted(seen, reverse=True) and len(seen) == 6
+
+    pending_by_priority = client.get("/todos/", params={"complete": False, "sort": "priority"}).json()["todos"]
+    assert [todo["priority"] for todo in pending_by_priority] == [1, 2, 3, 5]
+
+    assert client.get("/todos/", params={"sort": "title"}).status_code == 422
+    assert client.get("/todos/", params={"priority": 9}).status_code == 422
+    assert client.get("/todos/", params={"sort": "priority", "after": "7"}).status_code == 422
+
+def test_priority_cursor_survives_deleted_row(test_todo):
+    """Test that a priority page continues after its cursor todo is deleted"""
+    todos = [{"title": f"Todo {n}", "description": "Cursor", "priority": priority, "complete": False}
+             for n, priority in enumerate([1, 2, 2, 3, 4, 5])]
+    client.post("/todos/batch", json={"operations": [{"op": "create", "todo": todo} for todo in todos]})
+
+    page = client.get("/todos/", params={"sort": "priority", "limit": 3}).json()
+    assert [todo["id"] for todo in page["todos"]] == [2, 3, 4]
+    client.delete(f"/todos/todo/{page['todos'][-1]['id']}")
+
+    rest = client.get("/todos/", params={"sort": "priority", "after": page["next_cursor"]}).json()
+    assert [todo["id"] for todo in rest["todos"]] == [5, 6, 1, 7]
+
+def test_priority_cursor_survives_edited_row(test_todo):
+    """Test that a priority page continues from where it was, not from the cursor todo's new priority"""
+    todos = [{"title": f"Todo {n}", "description": "Cursor", "priority": priority, "complete": False}
+             for n, priority in enumerate([1, 2, 2, 3, 4, 5])]
+    client.post("/todos/batch", json={"operations": [{"op": "create", "todo": todo} for todo in todos]})
+
+    page = client.get("/todos/", params={"sort": "priority", "limit": 3}).json()
+    assert [todo["id"] for todo in page["todos"]] == [2, 3, 4]
+    client.put("/todos/todo/4", json={"title": "Todo 2", "description": "Cursor", "priority": 5, "complete": False})
+
+    rest = client.get("/todos/", params={"sort": "priority", "after": page["next_cursor"]}).json()
+    assert [todo["id"] for todo in rest["todos"]] == [5, 6, 1, 4, 7]
+
+def test_reads_go_to_replica_until_client_writes(test_todo, tmp_path, monkeypatch):
+    """Test that read handlers use the replica, and the primary for a while after a write"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.pool import NullPool
+    from TodoApp import replica
+    from TodoApp.database import Base
+    from TodoApp.search import ensure_search_index
+
+    # A second SQLite file stands in for a replica that hasn't caught up
+    replica_file = tmp_path / "replica.db"
+    sync_replica = create_engine(f"sqlite:///{replica_file}")
+    Base.metadata.create_all(bind=sync_replica)
+    with sync_replica.begin() as connection:
+        ensure_search_index(connection)
+        connection.execute(text("INSERT INTO todos (title, description, priority, complete, owner_id) "
+                                "VALUES ('From the replica', 'Stale copy', 1, 0, 1)"))
+    sync_replica.dispose()
+    replica_engine = create_async_engine(f"sqlite+aiosqlite:///{replica_file}", poolclass=NullPool)
+    monkeypatch.setattr(replica, "get_replica_session_local", lambda: async_sessionmaker(replica_engine, expire_on_commit=False))
+    monkeypatch.setattr(replica, "get_async_session_local", lambda: conftest.TestingAsyncSessionLocal)
+    monkeypatch.delitem(conftest.app.dependency_overrides, get_read_db)
+
+    routed_client = TestClient(app)
+    titles = lambda: [todo["title"] for todo in routed_client.get("/todos/").json()["todos"]]
+
+    assert titles() == ["From the replica"]
+    assert replica.PIN_COOKIE not in routed_client.cookies
+
+    response = routed_client.post("/todos/todo", json={"title": "Fresh todo", "description": "Just written",
+                                                       "priority": 2, "complete": False})
+    assert response.status_code == 201
+    assert replica.PIN_COOKIE in routed_client.cookies
+    # Pinned: the client reads its own write from the primary
+    assert titles() == ["Learn to code", "Fresh todo"]
+
+    routed_client.cookies.clear()
+    assert titles() == ["From the replica"]
+
+    # A token client keeps no cookies; its user is pinned instead
+    monkeypatch.setattr(replica, "primary_pins", replica.PrimaryPins(10))
+    bearer = {"Authorization": f"Bearer {create_access_token('codingwithrobytest', 1, 'admin', timedelta(minutes=5))}"}
+    other_user = {"Authorization": f"Bearer {create_access_token('someoneelse', 2, 'user', timedelta(minutes=5))}"}
+    response = routed_client.put(f"/todos/todo/{test_todo.id}", headers=bearer,
+                                 json={"title": "Edited by token", "description": "Need to learn everyday",
+                                       "priority": 5, "complete": False})
+    assert response.status_code == 204
+    routed_client.cookies.clear()
+    api_titles = lambda headers: [todo["title"] for todo in routed_client.get("/todos/", headers=headers).json()["todos"]]
+    assert api_titles(bearer)[0] == "Edited by token"
+    assert api_titles(other_user) == ["From the replica"]
+    # Expired pin
+    replica.primary_pins.pin(1, time.time() - 1)
+    assert api_titles(bearer) == ["From the replica"]
+
+def test_todo_writes_publish_change_events(test_todo):
+    """Test that each todo write publishes one change event with the new data version"""
+    from TodoApp.events import todo_events
+    from TodoApp.models import TodoVersions
+
+    with conftest.TestingSessionLocal() as db:
+        version = getattr(db.get(TodoVersions, 1), "version", 0)
+
+    client.post("/todos/todo", json={"title": "Evented todo", "description": "Pushed to the page",
+                                      "priority": 3, "complete": False})
+    client.patch(f"/todos/todo/{test_todo.id}/toggle")
+    client.delete(f"/todos/todo/{test_todo.id}")
+
+    events = todo_events.replay(1, version, version + 3)
+    assert events is not None and [event.version for event in events] == [version + 1, version + 2, version + 3]
+    changes = [json.loads(event.message.split("data: ", 1)[1])["changes"] for event in events]
+    assert changes[0][0]["op"] == "upsert" and "Evented todo" in changes[0][0]["html"]
+    assert changes[1] == [{"op": "upsert", "id": test_todo.id, "complete": True, "html": changes[1][0]["html"]}]
+    assert "strike-through-td" in changes[1][0]["html"]
+    assert changes[2] == [{"op": "delete", "id": test_todo.id}]
+
+@pytest.mark.asyncio
+async def test_todo_event_stream_replays_then_follows_live_events():
+    """Test the SSE body: missed events first, then live ones, with a stale notice on any gap"""
+    import asyncio
+    from TodoApp.events import TodoEventHub, event_stream, stale_message, KEEPALIVE_MESSAGE
+
+    hub = TodoEventHub(history_size=10, max_users=10, max_pending=10)
+    hub.publish(1, 1, [{"op": "delete", "id": 1}])
+    hub.publish(1, 2, [{"op": "delete", "id": 2}])
+
+    # A page at version 1 gets version 2 replayed, then keepalives, then live events
+    stream = event_stream(hub, 1, 1, 2, keepalive=0.01)
+    assert (await anext(stream)).startswith("id: 2\n")
+    assert await anext(stream) == KEEPALIVE_MESSAGE
+    hub.publish(1, 3, [{"op": "delete", "id": 3}])
+    assert (await anext(stream)).startswith("id: 3\n")
+    # Version 4 was handled elsewhere: the page hears it is stale, and still gets 5
+    hub.publish(1, 5, [{"op": "delete", "id": 5}])
+    assert await anext(stream) == stale_message(4)
+    assert (await anext(stream)).startswith("id: 5\n")
+    await stream.aclose()
+    assert hub.stats()["connections"] == 0
+
+    # History no longer reaches back far enough, or the page is newer than the data:
+    # stale, then live updates from the current version on
+    for version, current_version in ((0, 5), (9, 5)):
+        stream = event_stream(hub, 1, version, current_version, keepalive=0.01)
+        assert await anext(stream) == stale_message(5)
+        hub.publish(1, 6, [])
+        assert (await anext(stream)).startswith("id: 6\n")
+        await stream.aclose()
+        hub = TodoEventHub(history_size=10, max_users=10, max_pending=10)
+
+    # A connection that falls too far behind hears it is stale once it drains
+    small_hub = TodoEventHub(history_size=10, max_users=10, max_pending=1)
+    stream = event_stream(small_hub, 1, 0, 0)
+    pending = asyncio.ensure_future(anext(stream))
+    await asyncio.sleep(0)
+    small_hub.publish(1, 1, [])
+    assert (await pending).startswith("id: 1\n")
+    small_hub.publish(1, 2, [])
+    small_hub.publish(1, 3, [])
+    assert (await anext(stream)).startswith("id: 2\n")
+    assert await anext(stream) == stale_message(2)
+    await stream.aclose()
+
+    # Streams end on their own; the browser reconnects from the last event id
+    stream = event_stream(hub, 1, 0, 0, keepalive=0.01, max_seconds=0.05)
+    assert [message async for message in stream if message != KEEPALIVE_MESSAGE] == []
+
+def test_todo_events_endpoint(monkeypatch):
+    """Test that the event stream authenticates with the cookie and tells pages it can't catch up that they are stale"""
+    from TodoApp.events import TodoEventHub, stale_message
+    from TodoApp.models import TodoVersions
+    from TodoApp.routers import todos
+
+    assert client.get("/todos/events").status_code == 401
+
+    client.post("/todos/todo", json={"title": "Before connecting", "description": "Bumps the version",
+                                      "priority": 1, "complete": False})
+    with conftest.TestingSessionLocal() as db:
+        current_version = db.get(TodoVersions, 1).version # type: ignore
+    # A fresh hub has no history, so a page rendered at version 0 can't catch up
+    monkeypatch.setattr(todos, "todo_events", TodoEventHub(10, 10, 10))
+    monkeypatch.setattr(todos, "TODO_EVENTS_MAX_SECONDS", 0.1)
+    token = create_access_token("codingwithrobytest", 1, "admin", timedelta(minutes=5))
+    response = TestClient(app, cookies={"access_token": token}).get("/todos/events", params={"version": 0})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text == stale_message(current_version)
+
+    # Caught up: nothing but the stream ending
+    response = TestClient(app, cookies={"access_token": token}).get("/todos/events", params={"version": current_version})
+    assert response.text == ""
+
+    with conftest.engine.begin() as connection:
+        connection.execute(text("DELETE FROM todos;"))
@@ -1,8 +1,9 @@
 from TodoApp.tests import conftest
-from TodoApp.routers.user import get_db, get_current_user
+from TodoApp.routers.user import get_db, get_read_db, get_current_user
 from fastapi import status
 
 conftest.app.dependency_overrides[get_db] = conftest.override_get_db
+conftest.app.dependency_overrides[get_read_db] = conftest.override_get_db
 conftest.app.dependency_overrides[get_current_user] = conftest.override_get_current_user
 
 def test_return_user(test_user):
@@ -14,6 +15,13 @@ def test_return_user(test_user):
     assert user_data["first_name"] == "Eric"
     assert user_data["last_name"] == "Roby"
     assert user_data["phone_number"] == "(111)-111-1111"
+    assert "hashed_password" not in user_data
+
+def test_return_user_deleted():
+    # The token still names a user whose row is gone
+    response = conftest.client.get("user")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json() == {"detail": "User not found."}
 
 def test_change_password_success(test_user):
     response = conftest.client.put("/user/password", json={"password": "testpassword", "new_password": "newpassword"})